@@ -0,0 +1,52 @@
+"""Compares runtime and modularity of the community detection backends
+available to `PGraphModuleParticipation` on a synthetic scale-free graph
+(or on a given edgelist)."""
+import sys
+import time
+from pathlib import Path
+
+import networkx as nx
+
+from pmotif_lib.community_detection import greedy_modularity, label_propagation, louvain
+from pmotif_lib.gtrieScanner.graph_io import read_edgelist
+
+
+NODES = 10**4
+EDGES_PER_NODE = 3
+TRIANGLE_PROBABILITY = 0.3
+
+BACKENDS = [
+    ("greedy modularity", greedy_modularity),
+    ("louvain", louvain),
+    ("label propagation", label_propagation),
+]
+
+
+def load_graph() -> nx.Graph:
+    """Load the edgelist given as first argument, or generate a scale-free graph with
+    community structure and string labels starting at 1, as read from an edgelist."""
+    if len(sys.argv) > 1:
+        return read_edgelist(Path(sys.argv[1]))
+    graph = nx.powerlaw_cluster_graph(
+        NODES, EDGES_PER_NODE, TRIANGLE_PROBABILITY, seed=0
+    )
+    return nx.relabel_nodes(graph, lambda node: str(node + 1))
+
+
+def main():
+    """Time each backend and report the modularity of its communities."""
+    graph = load_graph()
+    print(f"{graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+    for name, community_detection in BACKENDS:
+        start = time.perf_counter()
+        communities = community_detection(graph)
+        duration = time.perf_counter() - start
+        modularity = nx.community.modularity(graph, communities)
+        print(
+            f"{name}: {duration:.2f}s, {len(communities)} communities, "
+            f"modularity {modularity:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
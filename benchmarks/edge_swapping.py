@@ -0,0 +1,48 @@
+"""Compares the networkx and the array edge swapping engine on a synthetic scale-free graph
+(or on a given edgelist)."""
+import random
+import sys
+import time
+from pathlib import Path
+
+import networkx as nx
+
+from pmotif_lib.gtrieScanner.graph_io import read_edgelist
+from pmotif_lib.randomization import swap_edges_array, swap_edges_markov_chain
+
+
+NODES = 10**5
+EDGES_PER_NODE = 5
+SWAPS_PER_EDGE = 3
+TRIES_PER_SWAP = 10
+
+
+def load_graph() -> nx.Graph:
+    """Load the edgelist given as first argument, or generate a scale-free graph
+    with string labels starting at 1, as read from an edgelist."""
+    if len(sys.argv) > 1:
+        return read_edgelist(Path(sys.argv[1]))
+    graph = nx.barabasi_albert_graph(NODES, EDGES_PER_NODE, seed=0)
+    return nx.relabel_nodes(graph, lambda node: str(node + 1))
+
+
+def main():
+    """Time both engines and report how many of the original edges remain."""
+    graph = load_graph()
+    print(f"{graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges")
+    original_edges = {frozenset(edge) for edge in graph.edges()}
+
+    random.seed(0)
+    for name, engine in [
+        ("networkx", lambda g: swap_edges_markov_chain(g.copy(), SWAPS_PER_EDGE, TRIES_PER_SWAP)),
+        ("array", lambda g: swap_edges_array(g, SWAPS_PER_EDGE, TRIES_PER_SWAP, seed=0)),
+    ]:
+        start = time.perf_counter()
+        random_graph = engine(graph)
+        duration = time.perf_counter() - start
+        kept = sum(frozenset(edge) in original_edges for edge in random_graph.edges())
+        print(f"{name}: {duration:.2f}s, {kept} original edges kept")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Compares reading an edgelist into a CSR adjacency through networkx with the bulk reader
+`read_edgelist_csr`, with and without its binary sidecar, on a synthetic edgelist."""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from pmotif_lib.csr_graph import CSRGraph
+from pmotif_lib.gtrieScanner.graph_io import (
+    get_csr_sidecar_path,
+    read_edgelist,
+    read_edgelist_csr,
+)
+
+
+EDGES = 10**6
+NODE_COUNT = 10**5
+
+
+def write_synthetic_edgelist(path: Path, edges: int):
+    """Write an edgelist of random edges in the `u v 1` format of `write_shifted_edgelist`,
+    including some self loops and repeated edges."""
+    rng = np.random.default_rng(0)
+    nodes = rng.integers(1, NODE_COUNT + 1, (edges, 2))
+    with open(path, "w", encoding="utf-8") as out:
+        out.writelines(f"{u} {v} 1\n" for u, v in nodes.tolist())
+
+
+def main(edges: int):
+    """Time each way of reading the edgelist."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        edgelist = Path(tmp_dir) / "synthetic.edgelist"
+        write_synthetic_edgelist(edgelist, edges)
+
+        start = time.perf_counter()
+        expected = CSRGraph.from_networkx(read_edgelist(edgelist))
+        print(f"networkx: {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        csr_graph, _ = read_edgelist_csr(edgelist, use_sidecar=False)
+        print(f"bulk: {time.perf_counter() - start:.2f}s")
+        assert csr_graph.number_of_edges == expected.number_of_edges
+
+        read_edgelist_csr(edgelist)
+        start = time.perf_counter()
+        csr_graph, _ = read_edgelist_csr(edgelist)
+        print(
+            f"sidecar: {time.perf_counter() - start:.3f}s, "
+            f"{os.path.getsize(get_csr_sidecar_path(edgelist)) / 2**20:.1f} MiB"
+        )
+        assert np.array_equal(csr_graph.degrees(), expected.degrees())
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else EDGES)
@@ -0,0 +1,93 @@
+"""Compares the line-by-line gtrieScanner occurrence parser with the block-wise NumPy parser
+on a synthetic, zipped `motif_pos` file."""
+import sys
+import tempfile
+import time
+import zipfile
+from math import sqrt
+from pathlib import Path
+
+import numpy as np
+
+from pmotif_lib.graphlet_occurence import GraphletOccurrence
+from pmotif_lib.gtrieScanner.parsing import parse_graphlet_occurrences
+
+
+LINES = 10**7
+GRAPHLET_SIZE = 4
+NODE_COUNT = 10**6
+# Occurrence labels as written by gtrieScanner (reversed adj. matrix, followed by ':')
+LABELS = [
+    "0010000110010110:",
+    "0100101101010110:",
+    "0010001011010010:",
+    "0110100110010110:",
+]
+GENERATION_BATCH_SIZE = 10**6
+
+
+def write_synthetic_motif_pos(path: Path, lines: int):
+    """Write a zipped `motif_pos` file with `lines` random occurrences."""
+    rng = np.random.default_rng(0)
+    with zipfile.ZipFile(path, "w") as zipf:
+        with zipf.open("motif_pos", "w", force_zip64=True) as motif_pos_file:
+            for start in range(0, lines, GENERATION_BATCH_SIZE):
+                batch_size = min(GENERATION_BATCH_SIZE, lines - start)
+                labels = rng.integers(0, len(LABELS), batch_size)
+                nodes = rng.integers(1, NODE_COUNT, (batch_size, GRAPHLET_SIZE))
+                motif_pos_file.write(
+                    "".join(
+                        f"{LABELS[label]} {' '.join(map(str, row))}\n"
+                        for label, row in zip(labels.tolist(), nodes.tolist())
+                    ).encode()
+                )
+
+
+def legacy_parse(motif_pos_file):
+    """The line-by-line parser `load_graphlet_pos_zip` used before the NumPy parser."""
+    graphlets = []
+    graphlet_size = None
+    for line in motif_pos_file:
+        label, *nodes = line.decode().split(" ")
+        label = label[:-1]
+        label = label[::-1]
+
+        if graphlet_size is None:
+            graphlet_size = int(sqrt(len(label)))
+
+        graphlet_class = " ".join(
+            [
+                label[i : i + graphlet_size]
+                for i in range(0, graphlet_size * graphlet_size, graphlet_size)
+            ]
+        )
+        graphlets.append(
+            GraphletOccurrence(
+                graphlet_class=graphlet_class,
+                nodes=[n.strip() for n in nodes],
+            )
+        )
+    return graphlets
+
+
+def main(lines: int):
+    """Time both parsers on the same synthetic file."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        motif_pos_zip = Path(tmp_dir) / "motif_pos.zip"
+        write_synthetic_motif_pos(motif_pos_zip, lines)
+
+        for name, parser in [
+            ("legacy", legacy_parse),
+            ("numpy", lambda f: parse_graphlet_occurrences(f, GRAPHLET_SIZE)),
+        ]:
+            with zipfile.ZipFile(motif_pos_zip, "r") as zfile:
+                with zfile.open("motif_pos") as motif_pos_file:
+                    start = time.perf_counter()
+                    occurrences = parser(motif_pos_file)
+                    duration = time.perf_counter() - start
+            print(f"{name}: {len(occurrences)} occurrences in {duration:.2f}s")
+            del occurrences
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else LINES)
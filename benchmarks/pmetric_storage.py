@@ -0,0 +1,65 @@
+"""Compares storing and loading graphlet metrics as json lines and in the binary storage
+of `PMetricResult`, on synthetic degree, anchor distance and module participation metrics."""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from pmotif_lib.p_metric.p_metric_result import BINARY_STORAGE, JSON_STORAGE, PMetricResult
+
+
+OCCURRENCES = 10**6
+ANCHOR_NODES = 20
+MAX_MODULES = 4
+
+
+def synthetic_metrics(occurrences: int):
+    """Return graphlet metrics of a fixed, a two-dimensional and a varying shape."""
+    rng = np.random.default_rng(0)
+    module_counts = rng.integers(1, MAX_MODULES + 1, occurrences)
+    modules = rng.integers(0, 100, module_counts.sum()).tolist()
+    offsets = np.concatenate([[0], np.cumsum(module_counts)]).tolist()
+    return {
+        "pDegree": rng.integers(0, 1000, occurrences).tolist(),
+        "pAnchorNodeDistance": rng.integers(-1, 8, (occurrences, ANCHOR_NODES)).tolist(),
+        "pGraphModuleParticipation": [
+            modules[start:end] for start, end in zip(offsets[:-1], offsets[1:])
+        ],
+    }
+
+
+def directory_size(directory: Path) -> int:
+    """Return the size of all files in a directory tree, in bytes."""
+    return sum(
+        os.path.getsize(Path(root) / file)
+        for root, _, files in os.walk(directory)
+        for file in files
+    )
+
+
+def main(occurrences: int):
+    """Time storing and loading each metric in both formats."""
+    for metric_name, graphlet_metrics in synthetic_metrics(occurrences).items():
+        metric_result = PMetricResult(metric_name, {}, graphlet_metrics)
+        for storage in (JSON_STORAGE, BINARY_STORAGE):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                output = Path(tmp_dir) / metric_name
+                start = time.perf_counter()
+                metric_result.save_to_disk(output, storage)
+                save_duration = time.perf_counter() - start
+
+                start = time.perf_counter()
+                loaded = PMetricResult.load_from_disk(output, supress_tqdm=True)
+                load_duration = time.perf_counter() - start
+                assert loaded.graphlet_metrics == graphlet_metrics
+                print(
+                    f"{metric_name} {storage}: save {save_duration:.2f}s, "
+                    f"load {load_duration:.2f}s, {directory_size(output) / 2**20:.1f} MiB"
+                )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else OCCURRENCES)
@@ -0,0 +1,90 @@
+"""Community detection backends used to partition a graph into graph modules.
+A backend takes a graph and returns its communities as lists of node labels."""
+from typing import Callable, List
+
+import networkx as nx
+import numpy as np
+from networkx.algorithms.community import greedy_modularity_communities
+
+from pmotif_lib.csr_graph import CSRGraph
+from pmotif_lib.node_ids import NodeIdMapping
+
+CommunityDetection = Callable[[nx.Graph], List[List[str]]]
+
+# Label propagation iterations without fewer unstable nodes, before labels settle
+_SETTLING_PATIENCE = 5
+
+
+def greedy_modularity(graph: nx.Graph) -> List[List[str]]:
+    """Greedy modularity optimization by networkx. Deterministic, but slow on large graphs."""
+    return list(map(list, greedy_modularity_communities(graph)))
+
+
+def louvain(graph: nx.Graph, seed: int = 0) -> List[List[str]]:
+    """Louvain modularity optimization by networkx, reproducible through `seed`."""
+    return list(map(list, nx.community.louvain_communities(graph, seed=seed)))
+
+
+def label_propagation(
+    graph: nx.Graph, seed: int = 0, max_iterations: int = 100
+) -> List[List[str]]:
+    """Semi-synchronous label propagation on the array-backed adjacency of the graph.
+    Each iteration, a random half of the nodes adopts one of the most frequent labels among
+    their neighbors (ties broken randomly), until all nodes carry such a label.
+    Reproducible through `seed`. Communities are sorted by size, largest first."""
+    node_id_mapping = NodeIdMapping.from_graph(graph)
+    csr = CSRGraph.from_networkx(graph, node_id_mapping)
+    rng = np.random.default_rng(seed)
+
+    degrees = csr.degrees()
+    edge_sources = np.repeat(np.arange(csr.id_count, dtype=np.int64), degrees)
+    labels = np.arange(csr.id_count, dtype=np.int64)
+
+    settling = False
+    fewest_unstable, iterations_without_progress = csr.id_count + 1, 0
+    for _ in range(max_iterations):
+        # Count each (node, neighbor label) pair
+        pairs, counts = np.unique(
+            edge_sources * csr.id_count + labels[csr.indices], return_counts=True
+        )
+        pair_nodes, pair_labels = np.divmod(pairs, csr.id_count)
+
+        max_counts = np.zeros(csr.id_count, dtype=np.int64)
+        np.maximum.at(max_counts, pair_nodes, counts)
+        own_label_counts = np.zeros(csr.id_count, dtype=np.int64)
+        is_own_label = pair_labels == labels[pair_nodes]
+        own_label_counts[pair_nodes[is_own_label]] = counts[is_own_label]
+        is_unstable = own_label_counts < max_counts
+        unstable_count = int(is_unstable.sum())
+        if unstable_count == 0:
+            break
+        if unstable_count < fewest_unstable:
+            fewest_unstable, iterations_without_progress = unstable_count, 0
+        else:
+            iterations_without_progress += 1
+        settling = settling or iterations_without_progress >= _SETTLING_PATIENCE
+
+        # Pick one most frequent label per node, random jitter breaks ties
+        order = np.lexsort((counts + rng.random(len(counts)), pair_nodes))
+        is_last_of_node = np.ones(len(order), dtype=bool)
+        is_last_of_node[:-1] = pair_nodes[order][1:] != pair_nodes[order][:-1]
+        best_pairs = order[is_last_of_node]
+
+        # Only half of the nodes change their label at once, which prevents neighbors from
+        # swapping labels back and forth. Once the number of unstable nodes stops decreasing,
+        # nodes which already carry a most frequent label keep it.
+        best_nodes = pair_nodes[best_pairs]
+        update = rng.random(len(best_pairs)) < 0.5
+        if settling:
+            update &= is_unstable[best_nodes]
+        labels[best_nodes[update]] = pair_labels[best_pairs][update]
+
+    node_labels = {int(node): node for node in graph.nodes}
+    node_ids = csr.node_ids
+    _, community_ids = np.unique(labels[node_ids], return_inverse=True)
+    communities: List[List[str]] = [[] for _ in range(community_ids.max(initial=-1) + 1)]
+    for label, community_id in zip(
+        node_id_mapping.to_labels(node_ids).tolist(), community_ids.tolist()
+    ):
+        communities[community_id].append(node_labels[label])
+    return sorted(communities, key=len, reverse=True)
@@ -0,0 +1,149 @@
+"""Array-backed representation of an undirected graph for vectorized metric calculation."""
+from __future__ import annotations
+from dataclasses import dataclass
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Sequence
+
+import networkx as nx
+import numpy as np
+
+from pmotif_lib.node_ids import NodeIdMapping
+
+# Number of BFS sources handled by one pool task
+_SOURCES_PER_TASK = 8
+
+# Graph of the running `bfs_distances` call, set once per worker process
+_BFS_WORKER_STATE: Dict[str, CSRGraph] = {}
+
+
+@dataclass(eq=False)
+class CSRGraph:
+    """An undirected simple graph in compressed sparse row layout.
+    The neighbors of node id `i` are `indices[indptr[i] : indptr[i + 1]]`.
+    Graphs built from networkx graphs use the contiguous node ids of a `NodeIdMapping`.
+    Ids without a node have no neighbors, `node_ids` lists the ids of all nodes of the graph."""
+
+    indptr: np.ndarray
+    indices: np.ndarray
+    node_ids: np.ndarray
+
+    @property
+    def id_count(self) -> int:
+        """Return the number of node ids, the highest node id plus one."""
+        return len(self.indptr) - 1
+
+    @property
+    def number_of_edges(self) -> int:
+        """Return the number of undirected edges."""
+        return len(self.indices) // 2
+
+    def degrees(self) -> np.ndarray:
+        """Return the degree of each node id."""
+        return np.diff(self.indptr)
+
+    def neighbors(self, node_id: int) -> np.ndarray:
+        """Return the node ids adjacent to `node_id`."""
+        return self.indices[self.indptr[node_id] : self.indptr[node_id + 1]]
+
+    @staticmethod
+    def from_edges(
+        sources: np.ndarray, targets: np.ndarray, node_ids: np.ndarray
+    ) -> CSRGraph:
+        """Build a graph from the node ids of each undirected edge.
+        Expects no repeated edges. Self loops are dropped."""
+        no_self_loop = sources != targets
+        sources, targets = sources[no_self_loop], targets[no_self_loop]
+
+        id_count = int(node_ids.max()) + 1 if len(node_ids) > 0 else 0
+        all_sources = np.concatenate([sources, targets])
+        all_targets = np.concatenate([targets, sources])
+        order = np.argsort(all_sources, kind="stable")
+
+        indptr = np.zeros(id_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(all_sources, minlength=id_count), out=indptr[1:])
+        return CSRGraph(
+            indptr=indptr,
+            indices=all_targets[order].astype(np.int32),
+            node_ids=np.sort(node_ids).astype(np.int32),
+        )
+
+    @staticmethod
+    def from_networkx(
+        graph: nx.Graph, node_id_mapping: Optional[NodeIdMapping] = None
+    ) -> CSRGraph:
+        """Build a graph from a networkx graph with integer node labels, using the node ids
+        of `node_id_mapping`, which is built from the graph if not given."""
+        if node_id_mapping is None:
+            node_id_mapping = NodeIdMapping.from_graph(graph)
+        edges = node_id_mapping.to_ids(
+            np.array([(int(u), int(v)) for u, v in graph.edges()], dtype=np.int64).reshape(
+                -1, 2
+            )
+        )
+        return CSRGraph.from_edges(
+            edges[:, 0], edges[:, 1], np.arange(len(node_id_mapping), dtype=np.int64)
+        )
+
+
+def bfs_distances(
+    graph: CSRGraph, sources: Sequence[int], workers: int = 1
+) -> np.ndarray:
+    """Return a (n_sources x n_node_ids) matrix of hop distances from each source node id,
+    holding -1 for unreachable nodes. Runs a level-synchronous BFS on the arrays of the graph,
+    splitting the sources across a pool of `workers` processes.
+    Distances are stored as int16, if they fit."""
+    source_blocks = [
+        list(sources[start : start + _SOURCES_PER_TASK])
+        for start in range(0, len(sources), _SOURCES_PER_TASK)
+    ]
+    if workers <= 1 or len(source_blocks) <= 1:
+        _initialize_bfs_worker(graph)
+        distance_blocks = list(map(_bfs_distances_block, source_blocks))
+        _BFS_WORKER_STATE.clear()
+    else:
+        with Pool(
+            processes=workers,
+            initializer=_initialize_bfs_worker,
+            initargs=(graph,),
+        ) as pool:
+            distance_blocks = pool.map(_bfs_distances_block, source_blocks, chunksize=1)
+
+    if len(distance_blocks) == 0:
+        return np.empty((0, graph.id_count), dtype=np.int16)
+    return np.concatenate(distance_blocks)
+
+
+def _initialize_bfs_worker(graph: CSRGraph):
+    """Store the graph to traverse in the current process."""
+    _BFS_WORKER_STATE["graph"] = graph
+
+
+def _bfs_distances_block(sources: List[int]) -> np.ndarray:
+    """Return the distances of a block of sources, in the smallest fitting dtype."""
+    graph = _BFS_WORKER_STATE["graph"]
+    distances = np.stack(
+        [_single_source_distances(graph, source) for source in sources]
+    )
+    if distances.max(initial=0) <= np.iinfo(np.int16).max:
+        return distances.astype(np.int16)
+    return distances
+
+
+def _single_source_distances(graph: CSRGraph, source: int) -> np.ndarray:
+    """Level-synchronous BFS, expanding the whole frontier with array operations per level."""
+    distances = np.full(graph.id_count, -1, dtype=np.int32)
+    distances[source] = 0
+    frontier = np.array([source], dtype=np.int64)
+    level = 0
+    while len(frontier) > 0:
+        level += 1
+        starts = graph.indptr[frontier]
+        lengths = graph.indptr[frontier + 1] - starts
+        # Positions of all neighbors of the frontier in `indices`
+        positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(
+            lengths.sum()
+        )
+        neighbors = graph.indices[positions]
+        frontier = np.unique(neighbors[distances[neighbors] < 0])
+        distances[frontier] = level
+    return distances
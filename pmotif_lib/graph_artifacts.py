@@ -0,0 +1,321 @@
+"""Cache for artifacts derived from a graph, such as its array representation, node degrees,
+hubs or BFS distances, which are shared by the pre-computations of several metrics."""
+from __future__ import annotations
+import json
+import os
+import statistics
+import sys
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import networkx as nx
+import numpy as np
+
+from pmotif_lib.csr_graph import CSRGraph, bfs_distances
+from pmotif_lib.gtrieScanner.graph_io import read_edgelist_csr
+from pmotif_lib.node_ids import NodeIdMapping
+from pmotif_lib.p_motif_graph import PMotifGraph
+
+# Names of the built-in artifacts
+NODE_LABELS = "node_labels"
+CSR_GRAPH = "csr_graph"
+DEGREES = "degrees"
+HUBS = "hubs"
+HUB_DISTANCES = "hub_distances"
+
+# Default bound of the memory held by the artifacts of one cache, in bytes
+DEFAULT_MAX_MEMORY = 2**30
+
+ARTIFACT_HEADER_FILE = "artifacts.json"
+# Stored artifacts of other format versions are discarded
+ARTIFACT_FORMAT_VERSION = 2
+NPY_SUFFIX = ".npy"
+NPZ_SUFFIX = ".npz"
+JSON_SUFFIX = ".json"
+
+GraphArtifactFactory = Callable[["GraphArtifactCache", int], Any]
+
+
+def get_hubs(graph: nx.Graph) -> List[str]:
+    """Return hubs of a networkx graph. Nodes with a degree higher than one standard deviations
+    above the mean degree are considered hubs.
+    """
+    degrees = dict(graph.degree)
+
+    degree_mean = statistics.mean(degrees.values())
+    degree_stdev = statistics.stdev(degrees.values())
+
+    return [
+        node
+        for node, degree in degrees.items()
+        if degree > degree_mean + degree_stdev
+    ]
+
+
+def _compute_node_labels(artifacts: GraphArtifactCache, workers: int) -> np.ndarray:
+    del workers
+    if artifacts.source is not None:
+        return read_edgelist_csr(artifacts.source)[1].labels
+    return NodeIdMapping.from_graph(artifacts.graph).labels
+
+
+def _compute_csr_graph(artifacts: GraphArtifactCache, workers: int) -> CSRGraph:
+    if artifacts.source is not None:
+        return read_edgelist_csr(artifacts.source)[0]
+    return CSRGraph.from_networkx(
+        artifacts.graph, artifacts.get_node_id_mapping(workers=workers)
+    )
+
+
+def _compute_degrees(artifacts: GraphArtifactCache, workers: int) -> np.ndarray:
+    return artifacts.get(CSR_GRAPH, workers=workers).degrees()
+
+
+def _compute_hubs(artifacts: GraphArtifactCache, workers: int) -> List[str]:
+    """Hubs as in `get_hubs`, from the degree array instead of the graph, ordered by node id."""
+    degrees = artifacts.get(DEGREES, workers=workers)
+    node_labels = artifacts.get(NODE_LABELS, workers=workers)
+    degree_mean = degrees.mean()
+    degree_stdev = degrees.std(ddof=1)
+    hub_ids = np.flatnonzero(degrees > degree_mean + degree_stdev)
+    return [str(label) for label in node_labels[hub_ids].tolist()]
+
+
+def _compute_hub_distances(artifacts: GraphArtifactCache, workers: int) -> np.ndarray:
+    node_id_mapping = artifacts.get_node_id_mapping(workers=workers)
+    hubs = [int(hub) for hub in artifacts.get(HUBS, workers=workers)]
+    return bfs_distances(
+        artifacts.get(CSR_GRAPH, workers=workers),
+        node_id_mapping.to_ids(np.array(hubs, dtype=np.int64)).tolist(),
+        workers=workers,
+    )
+
+
+BUILTIN_ARTIFACTS: Dict[str, GraphArtifactFactory] = {
+    NODE_LABELS: _compute_node_labels,
+    CSR_GRAPH: _compute_csr_graph,
+    DEGREES: _compute_degrees,
+    HUBS: _compute_hubs,
+    HUB_DISTANCES: _compute_hub_distances,
+}
+
+
+class GraphArtifactCache:
+    """Computes each artifact of a graph once, when it is first requested by name.
+    Built-in artifacts are listed in `BUILTIN_ARTIFACTS`, others are requested together with
+    the factory computing them. Array artifacts are indexed by the node ids of
+    `get_node_id_mapping`. Artifacts are kept in memory up to `max_memory` bytes,
+    evicting the least recently requested ones.
+    If a `directory` is given, artifacts are also stored there (numpy arrays and CSR graphs as
+    `.npy`/`.npz`, anything else as json) and loaded instead of computed on later requests,
+    also by other processes. Stored artifacts are listed in a header, and discarded if the
+    `source` edgelist of the graph changed since they were stored. Other files in the directory
+    are kept. Given a `source`, the CSR graph and node labels are
+    read from the edgelist (and its sidecar, see `read_edgelist_csr`) instead of the graph.
+    Instead of the `graph`, a `graph_loader` can be given, which is only called once the graph
+    is needed, e.g. by artifacts which are not read from the `source`."""
+
+    def __init__(
+        self,
+        graph: Optional[nx.Graph] = None,
+        directory: Optional[Path] = None,
+        source: Optional[Path] = None,
+        max_memory: int = DEFAULT_MAX_MEMORY,
+        graph_loader: Optional[Callable[[], nx.Graph]] = None,
+    ):
+        if graph is None and graph_loader is None:
+            raise ValueError("Either a graph or a graph loader is required!")
+        self._graph = graph
+        self._graph_loader = graph_loader
+        self.directory = directory
+        self.source = source
+        self.max_memory = max_memory
+        self._artifacts: OrderedDict[str, Any] = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._node_id_mapping: Optional[NodeIdMapping] = None
+
+        if self.directory is not None and self.directory.is_dir():
+            self._discard_stale_artifacts()
+
+    @staticmethod
+    def for_pmotif_graph(
+        pmotif_graph: PMotifGraph,
+        persist: bool = True,
+        max_memory: int = DEFAULT_MAX_MEMORY,
+    ) -> GraphArtifactCache:
+        """Return a cache for the graph of a PMotifGraph,
+        storing artifacts in its artifact directory next to the edgelist, if `persist`."""
+        return GraphArtifactCache(
+            graph_loader=pmotif_graph.load_graph,
+            directory=pmotif_graph.get_artifact_directory() if persist else None,
+            source=pmotif_graph.get_graph_path(),
+            max_memory=max_memory,
+        )
+
+    @property
+    def graph(self) -> nx.Graph:
+        """Return the graph, loading it on first access if only a graph loader was given."""
+        if self._graph is None:
+            self._graph = self._graph_loader()
+        return self._graph
+
+    def get(
+        self,
+        name: str,
+        factory: Optional[GraphArtifactFactory] = None,
+        workers: int = 1,
+    ) -> Any:
+        """Return the artifact `name`, computing it with `factory` (or the built-in factory)
+        and up to `workers` processes, if it is neither in memory nor stored."""
+        if name in self._artifacts:
+            self._artifacts.move_to_end(name)
+            return self._artifacts[name]
+
+        artifact = self._load(name)
+        if artifact is None:
+            if factory is None:
+                if name not in BUILTIN_ARTIFACTS:
+                    raise KeyError(f"Unknown graph artifact {name}!")
+                factory = BUILTIN_ARTIFACTS[name]
+            artifact = factory(self, workers)
+            self._store(name, artifact)
+
+        self._keep_in_memory(name, artifact)
+        return artifact
+
+    def get_node_id_mapping(self, workers: int = 1) -> NodeIdMapping:
+        """Return the mapping of node labels to the node ids indexing array artifacts,
+        such as degrees or distances. The mapping is built once per cache."""
+        if self._node_id_mapping is None:
+            self._node_id_mapping = NodeIdMapping(self.get(NODE_LABELS, workers=workers))
+        return self._node_id_mapping
+
+    def _keep_in_memory(self, name: str, artifact: Any):
+        """Keep the artifact, evicting least recently requested artifacts to fit the bound.
+        Artifacts larger than the bound are not kept."""
+        size = _artifact_size(artifact)
+        if size > self.max_memory:
+            return
+        while sum(self._sizes.values()) + size > self.max_memory:
+            evicted, _ = self._artifacts.popitem(last=False)
+            del self._sizes[evicted]
+        self._artifacts[name] = artifact
+        self._sizes[name] = size
+
+    def _source_header(self) -> Dict[str, Any]:
+        if self.source is None:
+            return {"format_version": ARTIFACT_FORMAT_VERSION}
+        source_stat = os.stat(self.source)
+        return {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "source_size": source_stat.st_size,
+            "source_mtime_ns": source_stat.st_mtime_ns,
+        }
+
+    def _discard_stale_artifacts(self):
+        """Delete the artifacts listed in the header, and the built-in ones, if the header
+        does not match the source. Other files, such as the sidecars of the edgelist, are kept."""
+        header_path = self.directory / ARTIFACT_HEADER_FILE
+        if not header_path.is_file():
+            # No artifacts stored yet, only sidecars of the edgelist, which validate themselves
+            return
+        with open(header_path, "r", encoding="utf-8") as header_file:
+            header = json.load(header_file)
+        stored_artifacts = header.pop("artifacts", [])
+        if header == self._source_header():
+            return
+
+        builtin_artifacts = [
+            f"{name}{suffix}"
+            for name in BUILTIN_ARTIFACTS
+            for suffix in (NPY_SUFFIX, NPZ_SUFFIX, JSON_SUFFIX)
+        ]
+        for file_name in stored_artifacts + builtin_artifacts:
+            if (self.directory / file_name).is_file():
+                os.remove(self.directory / file_name)
+        self._write_header([])
+
+    def _write_header(self, stored_artifacts: List[str]):
+        """Write the header of the stored artifacts, which lists their files."""
+        os.makedirs(self.directory, exist_ok=True)
+        header_path = self.directory / ARTIFACT_HEADER_FILE
+        temporary_path = header_path.with_name(f"{header_path.name}.tmp")
+        with open(temporary_path, "w", encoding="utf-8") as header_file:
+            json.dump({**self._source_header(), "artifacts": stored_artifacts}, header_file)
+        os.replace(temporary_path, header_path)
+
+    def _record_in_header(self, file_name: str):
+        """List an artifact file in the header, before it is written,
+        so that it is discarded together with the other artifacts."""
+        stored_artifacts = []
+        header_path = self.directory / ARTIFACT_HEADER_FILE
+        if header_path.is_file():
+            with open(header_path, "r", encoding="utf-8") as header_file:
+                stored_artifacts = json.load(header_file).get("artifacts", [])
+        if file_name not in stored_artifacts:
+            self._write_header(stored_artifacts + [file_name])
+
+    def _load(self, name: str) -> Optional[Any]:
+        """Load the stored artifact, None if it is not stored."""
+        if self.directory is None:
+            return None
+        if self._path(name, NPY_SUFFIX).is_file():
+            return np.load(self._path(name, NPY_SUFFIX))
+        if self._path(name, NPZ_SUFFIX).is_file():
+            with np.load(self._path(name, NPZ_SUFFIX)) as csr_arrays:
+                return CSRGraph(
+                    indptr=csr_arrays["indptr"],
+                    indices=csr_arrays["indices"],
+                    node_ids=csr_arrays["node_ids"],
+                )
+        if self._path(name, JSON_SUFFIX).is_file():
+            with open(self._path(name, JSON_SUFFIX), "r", encoding="utf-8") as artifact_file:
+                return json.load(artifact_file)
+        return None
+
+    def _store(self, name: str, artifact: Any):
+        """Store the artifact under a temporary name, and rename it once it is written."""
+        if self.directory is None:
+            return
+
+        if isinstance(artifact, np.ndarray):
+            suffix = NPY_SUFFIX
+        elif isinstance(artifact, CSRGraph):
+            suffix = NPZ_SUFFIX
+        else:
+            suffix = JSON_SUFFIX
+        path = self._path(name, suffix)
+        self._record_in_header(path.name)
+        temporary_path = path.with_name(f"{path.name}.tmp")
+        with open(temporary_path, "wb") as artifact_file:
+            if isinstance(artifact, np.ndarray):
+                np.save(artifact_file, artifact)
+            elif isinstance(artifact, CSRGraph):
+                np.savez(
+                    artifact_file,
+                    indptr=artifact.indptr,
+                    indices=artifact.indices,
+                    node_ids=artifact.node_ids,
+                )
+            else:
+                artifact_file.write(json.dumps(artifact).encode("utf-8"))
+        os.replace(temporary_path, path)
+
+    def _path(self, name: str, suffix: str) -> Path:
+        return self.directory / f"{name}{suffix}"
+
+
+def _artifact_size(artifact: Any) -> int:
+    """Estimate the memory held by an artifact in bytes."""
+    if isinstance(artifact, np.ndarray):
+        return artifact.nbytes
+    if isinstance(artifact, CSRGraph):
+        return artifact.indptr.nbytes + artifact.indices.nbytes + artifact.node_ids.nbytes
+    if isinstance(artifact, (list, tuple)):
+        return sys.getsizeof(artifact) + sum(map(_artifact_size, artifact))
+    if isinstance(artifact, dict):
+        return sys.getsizeof(artifact) + sum(
+            _artifact_size(key) + _artifact_size(value) for key, value in artifact.items()
+        )
+    return sys.getsizeof(artifact)
@@ -1,6 +1,23 @@
 """Class to encapsulate an induced subgraph and its isomorphic class."""
+from __future__ import annotations
+import json
+import os
+import shutil
 from dataclasses import dataclass
-from typing import List
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+from pmotif_lib.node_ids import NodeIdMapping
+
+NODE_DTYPE = np.int32
+# Largest node label which fits the node matrix
+MAX_NODE_LABEL = int(np.iinfo(NODE_DTYPE).max)
+GRAPHLET_CLASS_ID_DTYPE = np.uint16
+
+BINARY_FORMAT_VERSION = 1
+BINARY_HEADER_FILE = "header.json"
 
 
 @dataclass
@@ -20,3 +37,228 @@ class GraphletOccurrence:
 
     def __eq__(self, other):
         return self.graphlet_class == other.graphlet_class and self.nodes == other.nodes
+
+
+@dataclass(eq=False)
+class GraphletOccurrenceStore:
+    """Keeps track of many graphlet occurrences of the same size in a columnar layout.
+    The nodes of all occurrences are kept in a (n_occurrences, graphlet_size) int32 matrix
+    of their gtrieScanner labels (see `NodeIdMapping.to_ids` for array indices),
+    the graphlet class of each occurrence as an id into the `graphlet_classes` table.
+    `node_ids` optionally holds the node matrix interned to the node ids of the graph,
+    see `with_node_ids`.
+    Indexing with an integer and iterating yields `GraphletOccurrence` objects,
+    indexing with a slice yields a `GraphletOccurrenceStore` view."""
+
+    nodes: np.ndarray
+    graphlet_class_ids: np.ndarray
+    graphlet_classes: List[str]
+    node_ids: Optional[np.ndarray] = None
+
+    # Number of occurrences converted to python objects at once during iteration
+    _ITERATION_BATCH_SIZE = 2**16
+
+    @property
+    def graphlet_size(self) -> int:
+        """Returns the size of the stored induced subgraphs."""
+        return self.nodes.shape[1]
+
+    def __len__(self) -> int:
+        return self.nodes.shape[0]
+
+    def __getitem__(
+        self, index: Union[int, slice]
+    ) -> Union[GraphletOccurrence, GraphletOccurrenceStore]:
+        if isinstance(index, slice):
+            return GraphletOccurrenceStore(
+                nodes=self.nodes[index],
+                graphlet_class_ids=self.graphlet_class_ids[index],
+                graphlet_classes=self.graphlet_classes,
+                node_ids=None if self.node_ids is None else self.node_ids[index],
+            )
+        return GraphletOccurrence(
+            graphlet_class=self.graphlet_classes[self.graphlet_class_ids[index]],
+            nodes=[str(n) for n in self.nodes[index].tolist()],
+        )
+
+    def __iter__(self) -> Iterator[GraphletOccurrence]:
+        for start in range(0, len(self), self._ITERATION_BATCH_SIZE):
+            end = start + self._ITERATION_BATCH_SIZE
+            for class_id, nodes in zip(
+                self.graphlet_class_ids[start:end].tolist(),
+                self.nodes[start:end].tolist(),
+            ):
+                yield GraphletOccurrence(
+                    graphlet_class=self.graphlet_classes[class_id],
+                    nodes=[str(n) for n in nodes],
+                )
+
+    def with_node_ids(self, node_id_mapping: NodeIdMapping) -> GraphletOccurrenceStore:
+        """Return the occurrences together with their node matrix interned by `node_id_mapping`,
+        so that batch metrics index arrays of graph data with it directly."""
+        return GraphletOccurrenceStore(
+            nodes=self.nodes,
+            graphlet_class_ids=self.graphlet_class_ids,
+            graphlet_classes=self.graphlet_classes,
+            node_ids=node_id_mapping.to_ids(self.nodes),
+        )
+
+    def get_node_ids(self, node_labels: np.ndarray) -> np.ndarray:
+        """Return the node matrix as node ids of the graph with the given node labels
+        (see `NodeIdMapping`). Interns the node matrix, unless it is already interned."""
+        if self.node_ids is not None:
+            return self.node_ids
+        return NodeIdMapping(node_labels).to_ids(self.nodes)
+
+    @staticmethod
+    def empty(graphlet_size: int) -> GraphletOccurrenceStore:
+        """Return a store without any occurrences."""
+        return GraphletOccurrenceStore(
+            nodes=np.empty((0, graphlet_size), dtype=NODE_DTYPE),
+            graphlet_class_ids=np.empty(0, dtype=GRAPHLET_CLASS_ID_DTYPE),
+            graphlet_classes=[],
+        )
+
+    @staticmethod
+    def from_occurrences(
+        graphlet_occurrences: Iterable[GraphletOccurrence],
+    ) -> GraphletOccurrenceStore:
+        """Build a store from graphlet occurrence objects.
+        Node labels have to be integers, as in gtrieScanner output."""
+        graphlet_classes: List[str] = []
+        class_id_lookup = {}
+        nodes = []
+        graphlet_class_ids = []
+        for g_oc in graphlet_occurrences:
+            if g_oc.graphlet_class not in class_id_lookup:
+                class_id_lookup[g_oc.graphlet_class] = len(graphlet_classes)
+                graphlet_classes.append(g_oc.graphlet_class)
+            graphlet_class_ids.append(class_id_lookup[g_oc.graphlet_class])
+            nodes.append([int(n) for n in g_oc.nodes])
+
+        if len(nodes) == 0:
+            return GraphletOccurrenceStore.empty(0)
+        node_matrix = np.array(nodes, dtype=np.int64)
+        if node_matrix.max() > MAX_NODE_LABEL:
+            raise ValueError(
+                f"Node label {node_matrix.max()} exceeds the largest label {MAX_NODE_LABEL}!"
+            )
+        return GraphletOccurrenceStore(
+            nodes=node_matrix.astype(NODE_DTYPE),
+            graphlet_class_ids=np.array(graphlet_class_ids, dtype=GRAPHLET_CLASS_ID_DTYPE),
+            graphlet_classes=graphlet_classes,
+        )
+
+    def save_to_disk(self, output: Path):
+        """Stores the occurrences in the binary layout read by `load_from_disk`."""
+        with GraphletOccurrenceStoreWriter(output, self.graphlet_size) as writer:
+            writer.write(self)
+
+    @staticmethod
+    def load_from_disk(output: Path, mmap: bool = True) -> GraphletOccurrenceStore:
+        """Loads occurrences stored in the binary layout at output.
+        Memory-maps the node matrix and class id column instead of reading them, if `mmap`."""
+        with open(output / BINARY_HEADER_FILE, "r", encoding="utf-8") as header_file:
+            header = json.load(header_file)
+
+        occurrence_count = header["occurrence_count"]
+        graphlet_size = header["graphlet_size"]
+        if occurrence_count == 0:
+            store = GraphletOccurrenceStore.empty(graphlet_size)
+            store.graphlet_classes = header["graphlet_classes"]
+            return store
+
+        columns = {}
+        for column, shape in [
+            ("nodes", (occurrence_count, graphlet_size)),
+            ("graphlet_class_ids", (occurrence_count,)),
+        ]:
+            dtype = np.dtype(header[f"{column}_dtype"])
+            if mmap:
+                columns[column] = np.memmap(
+                    output / f"{column}.bin", dtype=dtype, mode="r", shape=shape
+                )
+            else:
+                columns[column] = np.fromfile(
+                    output / f"{column}.bin", dtype=dtype
+                ).reshape(shape)
+
+        return GraphletOccurrenceStore(
+            nodes=columns["nodes"],
+            graphlet_class_ids=columns["graphlet_class_ids"],
+            graphlet_classes=header["graphlet_classes"],
+        )
+
+
+class GraphletOccurrenceStoreWriter:
+    """Writes graphlet occurrences chunk by chunk into the binary layout of
+    `GraphletOccurrenceStore`: A directory containing the raw int32 node matrix (`nodes.bin`),
+    the raw class id column (`graphlet_class_ids.bin`), and a json header with the shape,
+    the dtypes and the class table. The header is written on `close`.
+    Used as context manager, a failed write removes the directory instead, so that no
+    incomplete occurrences look complete."""
+
+    def __init__(self, output: Path, graphlet_size: int):
+        self.output = output
+        self.graphlet_size = graphlet_size
+        self.occurrence_count = 0
+        self.graphlet_classes: List[str] = []
+        self._class_id_lookup: Dict[str, int] = {}
+
+        os.makedirs(output)
+        # pylint: disable=consider-using-with
+        self._nodes_file = open(output / "nodes.bin", "wb")
+        self._graphlet_class_ids_file = open(output / "graphlet_class_ids.bin", "wb")
+
+    def write(self, graphlet_occurrences: GraphletOccurrenceStore):
+        """Append occurrences. Their class ids are translated into the class table of the writer."""
+        class_id_translation = np.array(
+            [self._get_class_id(c) for c in graphlet_occurrences.graphlet_classes],
+            dtype=GRAPHLET_CLASS_ID_DTYPE,
+        )
+        if len(graphlet_occurrences) > 0:
+            self._nodes_file.write(
+                np.ascontiguousarray(graphlet_occurrences.nodes, dtype=NODE_DTYPE)
+            )
+            self._graphlet_class_ids_file.write(
+                class_id_translation[graphlet_occurrences.graphlet_class_ids]
+            )
+        self.occurrence_count += len(graphlet_occurrences)
+
+    def close(self):
+        """Flush all occurrences and write the header."""
+        self._nodes_file.close()
+        self._graphlet_class_ids_file.close()
+        header = {
+            "format_version": BINARY_FORMAT_VERSION,
+            "graphlet_size": self.graphlet_size,
+            "occurrence_count": self.occurrence_count,
+            "nodes_dtype": np.dtype(NODE_DTYPE).name,
+            "graphlet_class_ids_dtype": np.dtype(GRAPHLET_CLASS_ID_DTYPE).name,
+            "graphlet_classes": self.graphlet_classes,
+        }
+        with open(
+            self.output / BINARY_HEADER_FILE, "w", encoding="utf-8"
+        ) as header_file:
+            json.dump(header, header_file)
+
+    def _get_class_id(self, graphlet_class: str) -> int:
+        if graphlet_class not in self._class_id_lookup:
+            self._class_id_lookup[graphlet_class] = len(self.graphlet_classes)
+            self.graphlet_classes.append(graphlet_class)
+        return self._class_id_lookup[graphlet_class]
+
+    def __enter__(self) -> GraphletOccurrenceStoreWriter:
+        return self
+
+    def abort(self):
+        """Close the files and remove the directory of the incomplete occurrences."""
+        self._nodes_file.close()
+        self._graphlet_class_ids_file.close()
+        shutil.rmtree(self.output)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -40,6 +40,11 @@ def get_graphlet_size_from_class(graphlet_class: str) -> int:
     return len(graphlet_class.split(" ")[0])
 
 
+def get_graphlet_edge_count_from_class(graphlet_class: str) -> int:
+    """Determine the number of edges of a graphlet class represented as adj. matrix string."""
+    return graphlet_class.count("1") // 2
+
+
 def graphlet_class_to_name(graphlet_class: str) -> str:
     """Return the name of a given graphlet represented adj. matrix string."""
     return GRAPHLET_CLASS_NAME_LOOKUP[graphlet_class]
@@ -1,7 +1,48 @@
 """Utilities to read and write edgelists in a gtrieScanner friendly format."""
+import json
+import os
+from dataclasses import asdict, dataclass
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import networkx as nx
+import numpy as np
+import pandas as pd
+
+from pmotif_lib.csr_graph import CSRGraph
+from pmotif_lib.node_ids import NodeIdMapping
+
+# Suffix of the directory next to an edgelist, holding files derived from it
+ARTIFACT_DIRECTORY_SUFFIX = "_artifacts"
+# Binary sidecar in the artifact directory of an edgelist, caching its CSR adjacency
+CSR_SIDECAR_FILE = "edgelist_csr.npz"
+# Json sidecar in the artifact directory of an edgelist, caching its statistics
+STATS_SIDECAR_FILE = "edgelist_stats.json"
+
+# Number of edgelist lines parsed at once by `read_edgelist_stats`
+STATS_BLOCK_SIZE = 2**22
+
+# Parsing options for the node columns of an edgelist, with or without weights
+_EDGELIST_CSV_OPTIONS: Dict[str, Any] = {
+    "sep": r"\s+",
+    "header": None,
+    "usecols": [0, 1],
+    "comment": "#",
+    "dtype": np.int64,
+}
+
+
+@dataclass
+class EdgelistStats:
+    """Statistics of an edgelist with integer node labels, see `read_edgelist_stats`.
+    Edges and self loops are counted as listed, including repeated edges.
+    The smallest and largest node label are None for an empty edgelist."""
+
+    min_node: Optional[int]
+    max_node: Optional[int]
+    node_count: int
+    edge_count: int
+    self_loop_count: int
 
 
 def write_shifted_edgelist(
@@ -29,13 +70,149 @@ def write_shifted_edgelist(
         out.writelines(lines)
 
 
-def read_edgelist(graph_edgelist: Path) -> nx.Graph:
-    """Read an edgelist without data, creating an undirected simple graph with no self loops."""
+def read_edgelist(graph_edgelist: Path, remove_self_loops: bool = True) -> nx.Graph:
+    """Read an edgelist without data, creating an undirected simple graph with no self loops,
+    unless `remove_self_loops` is False."""
     # Make sure network is in gTrie-readable format
     graph = nx.read_edgelist(
         str(graph_edgelist),
         data=False,
         create_using=nx.Graph,  # No repeated edges, no direction
     )
-    graph.remove_edges_from(nx.selfloop_edges(graph))
+    if remove_self_loops:
+        graph.remove_edges_from(nx.selfloop_edges(graph))
     return graph
+
+
+def get_artifact_directory(graph_edgelist: Path) -> Path:
+    """Return the directory next to an edgelist, where files derived from it are stored.
+    Being a directory, it is not mistaken for another edgelist in listings of edgelists."""
+    return graph_edgelist.with_name(graph_edgelist.name + ARTIFACT_DIRECTORY_SUFFIX)
+
+
+def get_csr_sidecar_path(graph_edgelist: Path) -> Path:
+    """Return the location of the binary sidecar of an edgelist, see `read_edgelist_csr`."""
+    return get_artifact_directory(graph_edgelist) / CSR_SIDECAR_FILE
+
+
+def read_edgelist_csr(
+    graph_edgelist: Path, use_sidecar: bool = True
+) -> Tuple[CSRGraph, NodeIdMapping]:
+    """Read an edgelist with integer node labels into the CSR adjacency of the undirected simple
+    graph without self loops which `read_edgelist` creates, and the mapping of its node labels to
+    the node ids of the adjacency. Parses the whole file at once into integer arrays.
+    With `use_sidecar`, the result is cached in a binary sidecar in the artifact directory of the
+    edgelist (see `get_csr_sidecar_path`), which is loaded instead while the edgelist is
+    unchanged."""
+    sidecar = get_csr_sidecar_path(graph_edgelist)
+    source_stat = _get_source_stat(graph_edgelist)
+    if use_sidecar and sidecar.is_file():
+        with np.load(sidecar) as arrays:
+            if arrays["source_stat"].tolist() == source_stat:
+                labels = arrays["labels"]
+                return (
+                    CSRGraph(
+                        indptr=arrays["indptr"],
+                        indices=arrays["indices"],
+                        node_ids=np.arange(len(labels), dtype=np.int32),
+                    ),
+                    NodeIdMapping(labels),
+                )
+
+    csr_graph, node_id_mapping = _parse_edgelist_csr(graph_edgelist)
+    if use_sidecar:
+        os.makedirs(sidecar.parent, exist_ok=True)
+        temporary_sidecar = sidecar.with_name(f"{sidecar.name}.tmp")
+        with open(temporary_sidecar, "wb") as sidecar_file:
+            np.savez(
+                sidecar_file,
+                indptr=csr_graph.indptr,
+                indices=csr_graph.indices,
+                labels=node_id_mapping.labels,
+                source_stat=np.array(source_stat, dtype=np.int64),
+            )
+        os.replace(temporary_sidecar, sidecar)
+    return csr_graph, node_id_mapping
+
+
+def _get_source_stat(graph_edgelist: Path) -> List[int]:
+    """Return the size and modification time of an edgelist, which identify its version."""
+    source_stat = os.stat(graph_edgelist)
+    return [source_stat.st_size, source_stat.st_mtime_ns]
+
+
+def _parse_edgelist_csr(graph_edgelist: Path) -> Tuple[CSRGraph, NodeIdMapping]:
+    """Parse the first two columns of an edgelist with pandas, intern the node labels,
+    and drop self loops and repeated edges (in either direction) with array operations."""
+    try:
+        edges = pd.read_csv(graph_edgelist, **_EDGELIST_CSV_OPTIONS).to_numpy()
+    except pd.errors.EmptyDataError:
+        edges = np.empty((0, 2), dtype=np.int64)
+
+    labels, node_ids = np.unique(edges, return_inverse=True)
+    node_id_mapping = NodeIdMapping(labels)
+    node_ids = node_ids.reshape(-1, 2).astype(np.int64)
+
+    # Each undirected edge is kept once, from its smaller to its larger node id
+    sources, targets = node_ids.min(axis=1), node_ids.max(axis=1)
+    no_self_loop = sources != targets
+    edge_keys = np.unique(sources[no_self_loop] * len(labels) + targets[no_self_loop])
+    sources, targets = np.divmod(edge_keys, len(labels))
+    return (
+        CSRGraph.from_edges(sources, targets, np.arange(len(labels), dtype=np.int64)),
+        node_id_mapping,
+    )
+
+
+def get_stats_sidecar_path(graph_edgelist: Path) -> Path:
+    """Return the location of the statistics sidecar of an edgelist, see `read_edgelist_stats`."""
+    return get_artifact_directory(graph_edgelist) / STATS_SIDECAR_FILE
+
+
+def read_edgelist_stats(graph_edgelist: Path, use_sidecar: bool = True) -> EdgelistStats:
+    """Return the statistics of an edgelist with integer node labels, from one streaming pass
+    over blocks of `STATS_BLOCK_SIZE` lines, which only holds the distinct node labels.
+    With `use_sidecar`, the statistics are cached in a json sidecar in the artifact directory of
+    the edgelist (see `get_stats_sidecar_path`), which is loaded instead while the edgelist is
+    unchanged."""
+    sidecar = get_stats_sidecar_path(graph_edgelist)
+    source_stat = _get_source_stat(graph_edgelist)
+    if use_sidecar and sidecar.is_file():
+        with open(sidecar, "r", encoding="utf-8") as sidecar_file:
+            cached = json.load(sidecar_file)
+        if cached["source_stat"] == source_stat:
+            return EdgelistStats(**cached["stats"])
+
+    nodes = np.empty(0, dtype=np.int64)
+    edge_count, self_loop_count = 0, 0
+    for edges in _iter_edge_blocks(graph_edgelist, STATS_BLOCK_SIZE):
+        nodes = np.union1d(nodes, edges)
+        edge_count += len(edges)
+        self_loop_count += int((edges[:, 0] == edges[:, 1]).sum())
+    stats = EdgelistStats(
+        min_node=int(nodes[0]) if len(nodes) > 0 else None,
+        max_node=int(nodes[-1]) if len(nodes) > 0 else None,
+        node_count=len(nodes),
+        edge_count=edge_count,
+        self_loop_count=self_loop_count,
+    )
+
+    if use_sidecar:
+        os.makedirs(sidecar.parent, exist_ok=True)
+        temporary_sidecar = sidecar.with_name(f"{sidecar.name}.tmp")
+        with open(temporary_sidecar, "w", encoding="utf-8") as sidecar_file:
+            json.dump({"source_stat": source_stat, "stats": asdict(stats)}, sidecar_file)
+        os.replace(temporary_sidecar, sidecar)
+    return stats
+
+
+def _iter_edge_blocks(graph_edgelist: Path, block_size: int) -> Iterator[np.ndarray]:
+    """Yield the node columns of an edgelist as (n_edges x 2) arrays of up to `block_size`
+    edges."""
+    try:
+        reader = pd.read_csv(graph_edgelist, chunksize=block_size, **_EDGELIST_CSV_OPTIONS)
+    except pd.errors.EmptyDataError:
+        return
+    with reader:
+        for block in reader:
+            yield block.to_numpy()
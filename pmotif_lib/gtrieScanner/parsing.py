@@ -1,6 +1,17 @@
 """Utility to read gtrieScanner output."""
 from pathlib import Path
-from typing import Dict
+from typing import BinaryIO, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from pmotif_lib.graphlet_occurence import (
+    GraphletOccurrenceStore,
+    MAX_NODE_LABEL,
+    NODE_DTYPE,
+    GRAPHLET_CLASS_ID_DTYPE,
+)
 
 
 def parse_graphlet_detection_results_table(
@@ -38,3 +49,205 @@ def parse_graphlet_detection_results_table(
         frequencies[graphlet_class] = int(frequency)
 
     return frequencies
+
+
+def parse_graphlet_occurrences(
+    motif_pos_file: BinaryIO,
+    graphlet_size: int,
+    block_size: int = 2**20,
+    pbar: Optional[tqdm] = None,
+) -> GraphletOccurrenceStore:
+    """Load all graphlet occurrences of a gtrieScanner occurrence file (`motif_pos`).
+    Reads the file in blocks of `block_size` bytes and parses each block with NumPy,
+    see `iter_graphlet_occurrence_blocks`."""
+    blocks = list(
+        iter_graphlet_occurrence_blocks(motif_pos_file, graphlet_size, block_size, pbar)
+    )
+    if len(blocks) == 0:
+        return GraphletOccurrenceStore.empty(graphlet_size)
+    return _concatenate_stores(blocks)
+
+
+def iter_graphlet_occurrence_blocks(
+    motif_pos_file: BinaryIO,
+    graphlet_size: int,
+    block_size: int = 2**20,
+    pbar: Optional[tqdm] = None,
+) -> Iterator[GraphletOccurrenceStore]:
+    """Yield the graphlet occurrences of a gtrieScanner occurrence file (`motif_pos`)
+    block by block. Each block covers roughly `block_size` bytes of complete lines.
+    All yielded stores share one class table, which grows as new graphlet classes are found.
+    If given, `pbar` is advanced by the number of parsed occurrences."""
+    class_table = _GraphletClassTable(graphlet_size)
+
+    remainder = b""
+    while True:
+        block = motif_pos_file.read(block_size)
+        if not block:
+            break
+        block = remainder + block
+        cut = block.rfind(b"\n") + 1
+        block, remainder = block[:cut], block[cut:]
+        if block:
+            yield _parse_occurrence_block(block, graphlet_size, class_table, pbar)
+
+    if remainder.strip():
+        # Last line without trailing newline
+        yield _parse_occurrence_block(
+            remainder + b"\n", graphlet_size, class_table, pbar
+        )
+
+
+def iter_graphlet_occurrence_chunks(
+    motif_pos_file: BinaryIO,
+    graphlet_size: int,
+    chunk_size: int,
+    pbar: Optional[tqdm] = None,
+) -> Iterator[GraphletOccurrenceStore]:
+    """Yield the graphlet occurrences of a gtrieScanner occurrence file (`motif_pos`)
+    in chunks of exactly `chunk_size` occurrences. Only the last chunk can be smaller."""
+    pending: List[GraphletOccurrenceStore] = []
+    pending_count = 0
+    for block in iter_graphlet_occurrence_blocks(
+        motif_pos_file, graphlet_size, pbar=pbar
+    ):
+        pending.append(block)
+        pending_count += len(block)
+        if pending_count < chunk_size:
+            continue
+
+        merged = _concatenate_stores(pending)
+        for start in range(0, len(merged) - chunk_size + 1, chunk_size):
+            yield merged[start : start + chunk_size]
+        rest = merged[len(merged) - len(merged) % chunk_size :]
+        pending, pending_count = [rest], len(rest)
+
+    if pending_count > 0:
+        yield _concatenate_stores(pending)
+
+
+def label_to_graphlet_class(label: str, graphlet_size: int) -> str:
+    """Turn a label of a gtrieScanner occurrence line into a graphlet class (adj. matrix string).
+    The label is the adj. matrix written in one line, followed by a ':'."""
+    label = label[:-1]  # Strip the trailing ':'
+
+    # gtrieScanner reverses the adj matrix when saving occurrences
+    label = label[::-1]
+
+    return " ".join(
+        [
+            label[i : i + graphlet_size]
+            for i in range(0, graphlet_size * graphlet_size, graphlet_size)
+        ]
+    )
+
+
+def _concatenate_stores(
+    stores: List[GraphletOccurrenceStore],
+) -> GraphletOccurrenceStore:
+    """Merge stores which share one class table."""
+    if len(stores) == 1:
+        return stores[0]
+    return GraphletOccurrenceStore(
+        nodes=np.concatenate([store.nodes for store in stores]),
+        graphlet_class_ids=np.concatenate(
+            [store.graphlet_class_ids for store in stores]
+        ),
+        graphlet_classes=stores[-1].graphlet_classes,
+    )
+
+
+class _GraphletClassTable:
+    """Lookup from label codes (the bits of an occurrence label read as one integer)
+    to graphlet class ids, building the graphlet class table on the fly."""
+
+    def __init__(self, graphlet_size: int):
+        if graphlet_size * graphlet_size > 64:
+            raise ValueError("Only graphlets up to size 8 are supported!")
+        self.graphlet_size = graphlet_size
+        self.graphlet_classes: List[str] = []
+        self._class_id_lookup: Dict[int, int] = {}
+
+    def get_class_id(self, label_code: int) -> int:
+        """Return the class id of a label code, registering its class if unknown."""
+        if label_code not in self._class_id_lookup:
+            if len(self.graphlet_classes) > np.iinfo(GRAPHLET_CLASS_ID_DTYPE).max:
+                raise ValueError("Too many graphlet classes for the class id column!")
+            label = format(label_code, f"0{self.graphlet_size * self.graphlet_size}b")
+            self._class_id_lookup[label_code] = len(self.graphlet_classes)
+            self.graphlet_classes.append(
+                label_to_graphlet_class(label + ":", self.graphlet_size)
+            )
+        return self._class_id_lookup[label_code]
+
+
+def _parse_occurrence_block(
+    block: bytes,
+    graphlet_size: int,
+    class_table: _GraphletClassTable,
+    pbar: Optional[tqdm],
+) -> GraphletOccurrenceStore:
+    """Parse complete occurrence lines of the form
+    '<adj.matrix written in one line>: <node1> <node2> ...\\n' without a per-line python loop."""
+    data = np.frombuffer(block, dtype=np.uint8)
+    label_length = graphlet_size * graphlet_size
+
+    line_ends = np.flatnonzero(data == ord("\n"))
+    line_starts = np.empty_like(line_ends)
+    line_starts[0] = 0
+    line_starts[1:] = line_ends[:-1] + 1
+    non_empty = line_ends > line_starts
+    line_starts, line_ends = line_starts[non_empty], line_ends[non_empty]
+    line_count = len(line_starts)
+    if line_count == 0:
+        return GraphletOccurrenceStore(
+            nodes=np.empty((0, graphlet_size), dtype=NODE_DTYPE),
+            graphlet_class_ids=np.empty(0, dtype=GRAPHLET_CLASS_ID_DTYPE),
+            graphlet_classes=class_table.graphlet_classes,
+        )
+
+    # Graphlet classes: Pack the label bits of each line into an integer code,
+    # and map each distinct code to its class id once per block
+    label_positions = line_starts[:, np.newaxis] + np.arange(label_length)
+    label_bits = (data[label_positions] == ord("1")).astype(np.uint64)
+    label_codes = label_bits @ (
+        np.uint64(1) << np.arange(label_length - 1, -1, -1, dtype=np.uint64)
+    )
+    inverse, unique_codes = pd.factorize(label_codes)
+    class_id_lookup = np.array(
+        [class_table.get_class_id(int(code)) for code in unique_codes],
+        dtype=GRAPHLET_CLASS_ID_DTYPE,
+    )
+    graphlet_class_ids = class_id_lookup[inverse]
+
+    # Nodes: Each line consists of graphlet_size + 1 digit runs, the label followed by the nodes
+    is_digit = (data - ord("0")) < 10
+    run_bounds = np.flatnonzero(np.diff(is_digit, prepend=False, append=False))
+    if len(run_bounds) != 2 * line_count * (graphlet_size + 1):
+        raise ValueError(
+            f"Malformed gtrieScanner occurrence output: expected {graphlet_size} nodes per line!"
+        )
+    node_runs = run_bounds.reshape(line_count, graphlet_size + 1, 2)[:, 1:, :]
+    node_starts = node_runs[:, :, 0].reshape(-1)
+    node_lengths = node_runs[:, :, 1].reshape(-1) - node_starts
+
+    # Horner scheme over the digit positions of all nodes at once
+    nodes = np.zeros(len(node_starts), dtype=np.int64)
+    for digit_index in range(node_lengths.max()):
+        has_digit = node_lengths > digit_index
+        digits = data[np.minimum(node_starts + digit_index, len(data) - 1)] - ord("0")
+        nodes = np.where(has_digit, nodes * 10 + digits, nodes)
+    if nodes.max() > MAX_NODE_LABEL:
+        raise ValueError(
+            f"Node label {nodes.max()} exceeds the largest label {MAX_NODE_LABEL}!"
+        )
+    nodes = nodes.astype(NODE_DTYPE)
+
+    if pbar is not None:
+        pbar.update(line_count)
+
+    return GraphletOccurrenceStore(
+        nodes=nodes.reshape(line_count, graphlet_size),
+        graphlet_class_ids=graphlet_class_ids,
+        graphlet_classes=class_table.graphlet_classes,
+    )
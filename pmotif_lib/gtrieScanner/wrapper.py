@@ -4,11 +4,64 @@
 # Therefore, we exclude those cases from py-linting:
 # pylint: disable=invalid-name, too-many-arguments
 import os
+import shutil
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass
+from functools import partial
+from itertools import product
+from multiprocessing import Pool
 from pathlib import Path
-from subprocess import Popen, PIPE
+from subprocess import DEVNULL, PIPE, Popen
+from typing import BinaryIO, Callable, List, Optional, Tuple
 import zipfile
 
-from pmotif_lib.gtrieScanner.graph_io import read_edgelist
+from tqdm import tqdm
+
+from pmotif_lib.graphlet_occurence import MAX_NODE_LABEL, GraphletOccurrenceStoreWriter
+from pmotif_lib.gtrieScanner.graph_io import read_edgelist_stats
+from pmotif_lib.gtrieScanner.parsing import iter_graphlet_occurrence_blocks
+from pmotif_lib.p_motif_graph import PMotifGraph
+
+# Storage backends for the detected graphlet occurrences
+ZIP_STORAGE = "zip"
+BINARY_STORAGE = "binary"
+
+# Bytes copied from gtrieScanner output into the zip at once
+_COPY_BUFFER_SIZE = 2**20
+# Seconds between attempts to release a reader still waiting on the named pipe
+_FIFO_RELEASE_INTERVAL = 0.1
+# Trailing stderr lines of gtrieScanner shown in the message of a GtrieScannerError
+_STDERR_TAIL_LINES = 10
+
+
+@dataclass
+class GtrieScannerRunReport:
+    """Outcome and resource usage of one gtrieScanner process.
+    `peak_rss` is the maximum resident set size of the process in bytes,
+    None where the platform does not report it.
+    `occurrence_count` is the number of stored graphlet occurrences, None if the run failed."""
+
+    command: List[str]
+    exit_code: int
+    stderr: str
+    wall_time: float
+    peak_rss: Optional[int]
+    occurrence_count: Optional[int] = None
+
+
+class GtrieScannerError(RuntimeError):
+    """Raised when gtrieScanner exits with a non-zero exit code.
+    The report of the failed run is kept in `report`."""
+
+    def __init__(self, report: GtrieScannerRunReport):
+        stderr_tail = "\n".join(report.stderr.splitlines()[-_STDERR_TAIL_LINES:])
+        super().__init__(
+            f"gtrieScanner exited with code {report.exit_code}!\n{stderr_tail}".strip()
+        )
+        self.report = report
 
 
 def run_gtrieScanner(
@@ -18,20 +71,41 @@ def run_gtrieScanner(
     gtrieScanner_executable: str,
     directed: bool = False,
     with_weights: bool = True,
-):
+    storage: str = ZIP_STORAGE,
+    stream_output: bool = False,
+) -> GtrieScannerRunReport:
     """
-    Detects motifs for the given edge list and compresses the result
+    Detects motifs for the given edge list and stores the graphlet occurrences.
+    `storage` selects how the occurrences are stored:
+    ZIP_STORAGE compresses the text output of gtrieScanner (`motif_pos.zip`),
+    BINARY_STORAGE converts it once into a memory-mappable binary layout (`motif_pos_binary`),
+    see `GraphletOccurrenceStore.load_from_disk`.
+    With `stream_output`, gtrieScanner writes its occurrences into a named pipe and they are
+    stored while it runs, so the uncompressed text output never lands on disk (POSIX only).
+    Returns the report of the gtrieScanner run.
+    Raises a `GtrieScannerError` if gtrieScanner fails. A failed run removes its output
+    directory, including partially stored occurrences, so that it can be repeated.
     """
-    out_dir = output_directory / str(graphlet_size)
-    os.makedirs(out_dir)
+    if storage not in (ZIP_STORAGE, BINARY_STORAGE):
+        raise ValueError(f"Unknown graphlet occurrence storage {storage}!")
+    if stream_output and not hasattr(os, "mkfifo"):
+        raise ValueError("Streaming gtrieScanner output requires named pipes!")
 
-    graph = read_edgelist(graph_edgelist)
+    edgelist_stats = read_edgelist_stats(graph_edgelist)
 
-    if "0" in graph.nodes:
+    if edgelist_stats.min_node is not None and edgelist_stats.min_node < 1:
         raise IndexError(
-            "Network contains a node with index 0! "
+            f"Network contains a node with index {edgelist_stats.min_node}! "
             "gtrieScanner only accepts node indices starting from 1!"
         )
+    if edgelist_stats.max_node is not None and edgelist_stats.max_node > MAX_NODE_LABEL:
+        raise IndexError(
+            f"Network contains a node with index {edgelist_stats.max_node}! "
+            f"Graphlet occurrences only store node indices up to {MAX_NODE_LABEL}!"
+        )
+
+    out_dir = output_directory / str(graphlet_size)
+    os.makedirs(out_dir)
 
     # Build GTrieScanner command
     directed_arg = "-d" if directed else "-u"
@@ -53,22 +127,218 @@ def run_gtrieScanner(
     ]
     command_parts = [str(p) for p in command_parts]
 
-    # Run gtrieScanner
-    with Popen(
-        command_parts,
-        stdout=PIPE,
-        stderr=PIPE,
-    ) as p:
+    if storage == BINARY_STORAGE:
+        store = partial(
+            _store_binary,
+            graphlet_size=graphlet_size,
+            motif_pos_binary=out_dir / "motif_pos_binary",
+        )
+    else:
+        store = partial(_store_zip, motif_pos_zip=out_dir / "motif_pos.zip")
+
+    try:
+        if stream_output:
+            report = _run_streaming(command_parts, out_dir / "motif_pos", store)
+        else:
+            report = _run(command_parts)
+            if report.exit_code != 0:
+                raise GtrieScannerError(report)
+            with open(out_dir / "motif_pos", "rb") as motif_pos_file:
+                report.occurrence_count = store(motif_pos_file)
+    except BaseException:
+        # Removes the named pipe or text output, and any partially stored occurrences
+        shutil.rmtree(out_dir, ignore_errors=True)
+        raise
+    os.remove(out_dir / "motif_pos")
+    return report
+
+
+def _run(command_parts: List[str]) -> GtrieScannerRunReport:
+    """Run gtrieScanner until it exits, capturing its stderr and resource usage.
+    stdout is discarded, stderr is drained before waiting, so that no full pipe blocks it."""
+    start = time.perf_counter()
+    with Popen(command_parts, stdout=DEVNULL, stderr=PIPE) as p:
+        stderr = p.stderr.read().decode(errors="replace")
+        peak_rss = _wait_with_peak_rss(p)
+    return GtrieScannerRunReport(
+        command=command_parts,
+        exit_code=p.returncode,
+        stderr=stderr,
+        wall_time=time.perf_counter() - start,
+        peak_rss=peak_rss,
+    )
+
+
+def _wait_with_peak_rss(p: Popen) -> Optional[int]:
+    """Wait for the process to exit and return its peak resident set size in bytes,
+    as reported by `os.wait4`. Returns None where `os.wait4` is not available."""
+    if not hasattr(os, "wait4"):
         p.wait()
+        return None
+    _, status, rusage = os.wait4(p.pid, 0)
+    # Decoded as by Popen, negative for a process killed by a signal
+    if os.WIFSIGNALED(status):
+        p.returncode = -os.WTERMSIG(status)
+    else:
+        p.returncode = os.WEXITSTATUS(status)
+    # ru_maxrss is given in kilobytes on Linux, in bytes on macOS
+    return rusage.ru_maxrss if sys.platform == "darwin" else rusage.ru_maxrss * 1024
+
+
+def _run_streaming(
+    command_parts: List[str],
+    motif_pos: Path,
+    store: Callable[[BinaryIO], int],
+) -> GtrieScannerRunReport:
+    """Run gtrieScanner with `motif_pos` as a named pipe, storing its content from a
+    reader thread while gtrieScanner writes it. A failing reader closes the pipe,
+    which stops gtrieScanner instead of blocking it. Re-raises the error of the reader."""
+    os.mkfifo(motif_pos)
+    occurrence_counts: List[int] = []
+    reader_errors: List[Exception] = []
 
-    # Store motifs in max compressed zip for space efficiency
+    def read_motif_pos():
+        try:
+            with open(motif_pos, "rb") as motif_pos_file:
+                occurrence_counts.append(store(motif_pos_file))
+        except Exception as exception:  # pylint: disable=broad-except
+            reader_errors.append(exception)
+
+    reader = threading.Thread(target=read_motif_pos, daemon=True)
+    reader.start()
+    try:
+        report = _run(command_parts)
+    finally:
+        _release_fifo_reader(motif_pos, reader)
+    if len(reader_errors) > 0:
+        raise reader_errors[0]
+    if report.exit_code != 0:
+        raise GtrieScannerError(report)
+    report.occurrence_count = occurrence_counts[0]
+    return report
+
+
+def _release_fifo_reader(motif_pos: Path, reader: threading.Thread):
+    """Wait for the reader of the named pipe to finish. If gtrieScanner exited without
+    opening the pipe, the reader still blocks on opening it: Open and close the pipe
+    for writing, so that it reads an empty output instead."""
+    while reader.is_alive():
+        try:
+            os.close(os.open(motif_pos, os.O_WRONLY | os.O_NONBLOCK))
+        except OSError:
+            # No reader waiting on the pipe (yet)
+            pass
+        reader.join(_FIFO_RELEASE_INTERVAL)
+
+
+@dataclass
+class GtrieScannerJobResult:
+    """Outcome of one gtrieScanner run of `run_gtrieScanner_batch`.
+    `error` holds the formatted exception of a failed run, None otherwise.
+    `report` holds the report of the gtrieScanner process, None if it did not run."""
+
+    graph_edgelist: Path
+    graphlet_size: int
+    duration: float
+    error: Optional[str] = None
+    report: Optional[GtrieScannerRunReport] = None
+
+    @property
+    def failed(self) -> bool:
+        """Returns whether the run raised an exception."""
+        return self.error is not None
+
+
+def run_gtrieScanner_batch(
+    pmotif_graphs: List[PMotifGraph],
+    graphlet_sizes: List[int],
+    gtrieScanner_executable: str,
+    directed: bool = False,
+    with_weights: bool = True,
+    storage: str = ZIP_STORAGE,
+    workers: int = 1,
+    stream_output: bool = False,
+) -> List[GtrieScannerJobResult]:
+    """
+    Runs `run_gtrieScanner` for every graph and graphlet size,
+    storing the occurrences in the graphlet directory of each graph.
+    Up to `workers` runs, including their storage step, execute concurrently in a process pool.
+    A failing run does not stop the others: Its exception is reported in its result.
+    Returns one result per (graph, graphlet size), in that order.
+    """
+    jobs = [
+        (
+            pmotif_graph.get_graph_path(),
+            graphlet_size,
+            pmotif_graph.get_graphlet_directory(),
+            gtrieScanner_executable,
+            directed,
+            with_weights,
+            storage,
+            stream_output,
+        )
+        for pmotif_graph, graphlet_size in product(pmotif_graphs, graphlet_sizes)
+    ]
+
+    results: List[Optional[GtrieScannerJobResult]] = [None] * len(jobs)
+    with tqdm(total=len(jobs), desc="gtrieScanner Runs", leave=False) as pbar:
+        if workers <= 1:
+            job_results = map(_run_gtrieScanner_job, enumerate(jobs))
+            for index, result in job_results:
+                results[index] = result
+                pbar.update()
+        else:
+            with Pool(processes=workers) as pool:
+                for index, result in pool.imap_unordered(
+                    _run_gtrieScanner_job, enumerate(jobs)
+                ):
+                    results[index] = result
+                    pbar.update()
+    return results
+
+
+def _run_gtrieScanner_job(job: Tuple[int, tuple]) -> Tuple[int, GtrieScannerJobResult]:
+    """Run gtrieScanner with the arguments of a job, timing it and catching its failure."""
+    index, args = job
+    start = time.perf_counter()
+    error, report = None, None
+    try:
+        report = run_gtrieScanner(*args)
+    except Exception as exception:  # pylint: disable=broad-except
+        if isinstance(exception, GtrieScannerError):
+            report = exception.report
+        error = "".join(
+            traceback.format_exception_only(type(exception), exception)
+        ).strip()
+    return index, GtrieScannerJobResult(
+        graph_edgelist=args[0],
+        graphlet_size=args[1],
+        duration=time.perf_counter() - start,
+        error=error,
+        report=report,
+    )
+
+
+def _store_zip(motif_pos_file: BinaryIO, motif_pos_zip: Path) -> int:
+    """Store motifs in max compressed zip for space efficiency.
+    Returns the number of stored occurrences (lines)."""
+    occurrence_count = 0
     with zipfile.ZipFile(
-        f"{output_directory / str(graphlet_size) / 'motif_pos.zip'}", "w"
+        motif_pos_zip, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=9
     ) as zipf:
-        zipf.write(
-            f"{output_directory / str(graphlet_size) / 'motif_pos'}",
-            compress_type=zipfile.ZIP_DEFLATED,
-            compresslevel=9,
-            arcname="motif_pos",
-        )
-    os.remove(output_directory / str(graphlet_size) / "motif_pos")
+        with zipf.open("motif_pos", "w", force_zip64=True) as zipped_motif_pos:
+            for buffer in iter(partial(motif_pos_file.read, _COPY_BUFFER_SIZE), b""):
+                occurrence_count += buffer.count(b"\n")
+                zipped_motif_pos.write(buffer)
+    return occurrence_count
+
+
+def _store_binary(
+    motif_pos_file: BinaryIO, graphlet_size: int, motif_pos_binary: Path
+):
+    """Convert motifs into the binary layout of GraphletOccurrenceStore.
+    Returns the number of stored occurrences."""
+    with GraphletOccurrenceStoreWriter(motif_pos_binary, graphlet_size) as writer:
+        for block in iter_graphlet_occurrence_blocks(motif_pos_file, graphlet_size):
+            writer.write(block)
+    return writer.occurrence_count
@@ -0,0 +1,63 @@
+"""Interning of the node labels of a graph to contiguous integer node ids."""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Iterable, List
+
+import networkx as nx
+import numpy as np
+
+NODE_ID_DTYPE = np.int32
+
+
+@dataclass(eq=False)
+class NodeIdMapping:
+    """Interns the integer node labels of a graph (as required by gtrieScanner) to the contiguous
+    node ids 0 to n - 1. Id `i` belongs to the `i`-th smallest label, `labels` holds the label
+    of each id. Arrays of graph data are indexed by node id, so that gaps between labels cost
+    no memory. Labels are only restored where nodes are handed out, e.g. in networkx graphs
+    and graphlet occurrences."""
+
+    labels: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @staticmethod
+    def from_labels(labels: Iterable) -> NodeIdMapping:
+        """Build the mapping of all distinct labels, given as integers or strings."""
+        return NodeIdMapping(np.unique(np.fromiter(map(int, labels), dtype=np.int64)))
+
+    @staticmethod
+    def from_graph(graph: nx.Graph) -> NodeIdMapping:
+        """Build the mapping of the nodes of a graph with integer node labels."""
+        return NodeIdMapping.from_labels(graph.nodes)
+
+    def to_ids(self, labels: np.ndarray) -> np.ndarray:
+        """Return the node id of each label, in the shape of `labels`.
+        Raises a KeyError for labels without a node, and a ValueError if the node ids
+        exceed `NODE_ID_DTYPE`."""
+        labels = np.asarray(labels, dtype=np.int64)
+        if len(self.labels) == 0:
+            node_ids = np.zeros_like(labels)
+            unknown = np.ones(labels.shape, dtype=bool)
+        elif self.labels[-1] - self.labels[0] + 1 == len(self.labels):
+            # Labels without gaps only need a shift
+            node_ids = labels - self.labels[0]
+            unknown = (node_ids < 0) | (node_ids >= len(self.labels))
+        else:
+            node_ids = np.searchsorted(self.labels, labels)
+            unknown = self.labels[np.minimum(node_ids, len(self.labels) - 1)] != labels
+        if unknown.any():
+            raise KeyError(f"Unknown node label {labels[unknown].flat[0]}!")
+        if len(self.labels) - 1 > np.iinfo(NODE_ID_DTYPE).max:
+            raise ValueError(f"{len(self.labels)} nodes exceed the range of node ids!")
+        return node_ids.astype(NODE_ID_DTYPE)
+
+    def to_labels(self, node_ids: np.ndarray) -> np.ndarray:
+        """Return the integer label of each node id, in the shape of `node_ids`."""
+        return self.labels[node_ids]
+
+    def to_label_strings(self, node_ids: Iterable[int]) -> List[str]:
+        """Return the label of each node id as string, as used in networkx graphs."""
+        labels = self.labels[np.asarray(node_ids, dtype=np.int64)]
+        return [str(label) for label in labels.tolist()]
@@ -2,13 +2,25 @@
 from statistics import mean
 from typing import List, Dict, Tuple
 
-from pmotif_lib.result_transformer import ConsolidationMethod
+import numpy as np
+
+from pmotif_lib.result_transformer import ConsolidationMethod, vectorized_consolidation
 from pmotif_lib.p_metric.p_anchor_node_distance import PAnchorNodeDistance
 from pmotif_lib.p_metric.p_degree import PDegree
 from pmotif_lib.p_metric.p_graph_module_participation import PGraphModuleParticipation
 from pmotif_lib.p_metric.p_metric import RawMetric, PreComputation
 
 
+def vectorized_degree_consolidation(
+    metric_array: np.ndarray, pre_compute: PreComputation
+) -> np.ndarray:
+    """Consolidate the whole PDegree column, which already holds a single number per
+    graphlet occurrence."""
+    del pre_compute
+    return metric_array
+
+
+@vectorized_consolidation(vectorized_degree_consolidation)
 def degree_consolidation(raw_metric: RawMetric, pre_compute: PreComputation) -> float:
     """Consolidate PDegree. PDegree already is a single number per graphlet occurrence,
     no additional consolidation needed."""
@@ -16,6 +28,53 @@ def degree_consolidation(raw_metric: RawMetric, pre_compute: PreComputation) ->
     return raw_metric
 
 
+def vectorized_max_normalized_anchor_hop_distances(
+    metric_array: np.ndarray, pre_compute: PreComputation
+) -> np.ndarray:
+    """Consolidate the whole PAnchorNodeDistance column. Normalize the distance matrix by
+    closeness centrality and return the highest distance of each occurrence."""
+    distances = _get_normalized_anchor_hop_distance_matrix(metric_array, pre_compute)
+    if distances.shape[1] == 0:
+        return np.full(len(distances), -1.0)
+    return distances.max(axis=1)
+
+
+def vectorized_min_normalized_anchor_hop_distances(
+    metric_array: np.ndarray, pre_compute: PreComputation
+) -> np.ndarray:
+    """Consolidate the whole PAnchorNodeDistance column. Normalize the distance matrix by
+    closeness centrality and return the lowest distance of each occurrence."""
+    distances = _get_normalized_anchor_hop_distance_matrix(metric_array, pre_compute)
+    if distances.shape[1] == 0:
+        return np.full(len(distances), -1.0)
+    return distances.min(axis=1)
+
+
+def vectorized_mean_normalized_anchor_hop_distances(
+    metric_array: np.ndarray, pre_compute: PreComputation
+) -> np.ndarray:
+    """Consolidate the whole PAnchorNodeDistance column. Normalize the distance matrix by
+    closeness centrality and return the mean distance of each occurrence."""
+    distances = _get_normalized_anchor_hop_distance_matrix(metric_array, pre_compute)
+    if distances.shape[1] == 0:
+        return np.full(len(distances), -1.0)
+    return distances.mean(axis=1)
+
+
+def _get_normalized_anchor_hop_distance_matrix(
+    metric_array: np.ndarray, pre_compute: PreComputation
+) -> np.ndarray:
+    """Divide the (n_occurrences x n_anchor_nodes) distance matrix by the closeness centrality
+    of each anchor node at once, see `_get_normalized_anchor_hop_distances`."""
+    anchor_nodes = pre_compute["anchor_nodes"]
+    closeness_centrality = np.array(
+        [pre_compute["closeness_centrality"][anchor_node] for anchor_node in anchor_nodes],
+        dtype=np.float64,
+    )
+    return np.reshape(metric_array, (len(metric_array), len(anchor_nodes))) / closeness_centrality
+
+
+@vectorized_consolidation(vectorized_max_normalized_anchor_hop_distances)
 def max_normalized_anchor_hop_distances(
     raw_metric: RawMetric, pre_compute: PreComputation
 ) -> float:
@@ -29,6 +88,7 @@ def max_normalized_anchor_hop_distances(
     return max(distances)
 
 
+@vectorized_consolidation(vectorized_min_normalized_anchor_hop_distances)
 def min_normalized_anchor_hop_distances(
     raw_metric: RawMetric, pre_compute: PreComputation
 ) -> float:
@@ -42,6 +102,7 @@ def min_normalized_anchor_hop_distances(
     return min(distances)
 
 
+@vectorized_consolidation(vectorized_mean_normalized_anchor_hop_distances)
 def mean_normalized_anchor_hop_distances(
     raw_metric: RawMetric, pre_compute: PreComputation
 ) -> float:
@@ -1,55 +1,88 @@
 """This utility takes a network and nodes (or supernodes)
 and calculates various positional metrics for those inputs"""
-from os import makedirs
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice, starmap
 from typing import (
+    Any,
     List,
     Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Union,
 )
 from multiprocessing import Pool
 from tqdm import tqdm
 import networkx as nx
-from pmotif_lib.graphlet_occurence import GraphletOccurrence
-from pmotif_lib.p_motif_graph import PMotifGraph
-from pmotif_lib.p_metric.p_metric import PMetric
-from pmotif_lib.p_metric.p_metric_result import PMetricResult
+import numpy as np
+from pmotif_lib.graph_artifacts import GraphArtifactCache
+from pmotif_lib.graphlet_occurence import GraphletOccurrence, GraphletOccurrenceStore
+from pmotif_lib.gtrieScanner.graph_io import read_edgelist
+from pmotif_lib.node_ids import NodeIdMapping
+from pmotif_lib.p_motif_graph import PMotifGraph, DEFAULT_CHUNK_SIZE
+from pmotif_lib.p_metric.p_metric import PMetric, PreComputation, RawMetric
+from pmotif_lib.p_metric.p_metric_result import (
+    BINARY_STORAGE,
+    JSON_STORAGE,
+    MetricCheckpoint,
+    PMetricResult,
+)
+
+GraphletOccurrenceInput = Union[
+    List[GraphletOccurrence],
+    GraphletOccurrenceStore,
+    Iterable[GraphletOccurrenceStore],
+]
+# Occurrences handed to the batch calculation of metrics at once
+OccurrenceChunk = Union[GraphletOccurrenceStore, List[GraphletOccurrence]]
 
 
 def process_graphlet_occurrences(
-    graph: nx.Graph,
-    graphlet_occurrences: List[GraphletOccurrence],
+    graph: Optional[nx.Graph],
+    graphlet_occurrences: GraphletOccurrenceInput,
     metrics: List[PMetric],
     workers: int = 1,
+    artifacts: Optional[GraphArtifactCache] = None,
 ) -> List[PMetricResult]:
-    """Calculate motif positional metrics"""
+    """Calculate motif positional metrics.
+    `graphlet_occurrences` can be a list of occurrences, a store, or an iterable of stores
+    (see `PMotifGraph.iter_graphlet_occurrences`), which is consumed chunk by chunk.
+    Occurrences are only interned to node ids if a metric overrides `metric_calculation_batch`,
+    otherwise a list of occurrences can hold any node labels of `graph`.
+    Metrics share the artifacts of the graph in their pre-computation, pass a cache of `graph`
+    as `artifacts` to share them with other calls. Given `artifacts`, `graph` can be None,
+    then the graph of the cache is only loaded if a metric needs it."""
+    if artifacts is None:
+        artifacts = GraphArtifactCache(graph)
 
     result: Dict[str, Dict] = {m.name: {} for m in metrics}
 
     # Pre-Compute for metrics
     metric: PMetric
     for metric in tqdm(metrics, desc="Pre-computing metrics", leave=False):
-        result[metric.name]["pre_compute"] = metric.pre_computation(graph)
+        result[metric.name]["pre_compute"] = metric.artifact_pre_computation(
+            artifacts, workers
+        )
+        result[metric.name]["graphlet_metrics"] = []
 
     # Calculate metrics
-    with Pool(processes=workers) as pool:
-        for metric in tqdm(metrics, desc="Calculating metrics", leave=False):
-            result[metric.name]["graphlet_metrics"] = []
-            args = [
-                (graph, g_oc.nodes, result[metric.name]["pre_compute"])
-                for g_oc in graphlet_occurrences
-            ]
-
-            with tqdm(
-                total=len(graphlet_occurrences),
-                desc="Graphlet Occurrence Progress",
-                leave=False,
-            ) as pbar:
-                for g_oc_result in pool.starmap(
-                    metric.metric_calculation,
-                    args,
-                    chunksize=100,
-                ):
-                    result[metric.name]["graphlet_metrics"].append(g_oc_result)
-                    pbar.update(1)
+    # Graph and pre-computes are handed to each worker once, tasks only carry occurrences
+    pre_computes = {m.name: result[m.name]["pre_compute"] for m in metrics}
+    chunks = _as_chunks(graphlet_occurrences, _get_node_id_mapping(artifacts, metrics, workers))
+    worker_graph = _get_worker_graph(artifacts, metrics)
+    with _create_pool(worker_graph, metrics, pre_computes, workers) as pool, tqdm(
+        total=sum(map(len, chunks)) if isinstance(chunks, list) else None,
+        desc="Graphlet Occurrence Progress",
+        leave=False,
+    ) as pbar:
+        for chunk in chunks:
+            blocks = _split_into_blocks(chunk, workers)
+            for metric in metrics:
+                result[metric.name]["graphlet_metrics"].extend(
+                    _calculate_metric_blocks(pool, metric.name, blocks)
+                )
+            pbar.update(len(chunk))
 
     return [
         PMetricResult(
@@ -61,31 +94,284 @@ def process_graphlet_occurrences(
     ]
 
 
+# Graph, metrics and pre-computes of the running `process_graphlet_occurrences` call.
+# Set once per worker process by `_initialize_worker`, instead of being sent with every task.
+_WORKER_STATE: Dict[str, Any] = {}
+
+# Number of tasks each worker receives per chunk of graphlet occurrences
+_BLOCKS_PER_WORKER = 4
+
+
+def _get_worker_graph(
+    artifacts: GraphArtifactCache, metrics: List[PMetric]
+) -> Optional[nx.Graph]:
+    """Return the graph handed to the batch calculation of the metrics, None if no metric
+    uses it (see `PMetric.BATCH_USES_GRAPH`), so that it is neither loaded nor sent to workers."""
+    if any(m.BATCH_USES_GRAPH for m in metrics):
+        return artifacts.graph
+    return None
+
+
+def _get_node_id_mapping(
+    artifacts: GraphArtifactCache, metrics: List[PMetric], workers: int
+) -> Optional[NodeIdMapping]:
+    """Return the node id mapping of the graph, which the batch calculations of the metrics
+    index their arrays with. None if no metric overrides `metric_calculation_batch`, then
+    occurrences are passed on with their labels, which can be any hashable node of the graph."""
+    if all(
+        type(m).metric_calculation_batch is PMetric.metric_calculation_batch
+        for m in metrics
+    ):
+        return None
+    return artifacts.get_node_id_mapping(workers=workers)
+
+
+def _initialize_worker(
+    graph: Optional[nx.Graph], metrics: List[PMetric], pre_computes: Dict[str, PreComputation]
+):
+    """Store the shared state of a metric calculation in the current process."""
+    _WORKER_STATE["graph"] = graph
+    _WORKER_STATE["metrics"] = {m.name: m for m in metrics}
+    _WORKER_STATE["pre_computes"] = pre_computes
+
+
+@contextmanager
+def _create_pool(
+    graph: Optional[nx.Graph],
+    metrics: List[PMetric],
+    pre_computes: Dict[str, PreComputation],
+    workers: int,
+) -> Iterator[Optional[Pool]]:
+    """Yield a pool whose workers hold the graph and pre-computes.
+    On platforms which fork, the state is inherited instead of pickled.
+    Yields None for a single worker, and calculates in the current process instead."""
+    if workers <= 1:
+        _initialize_worker(graph, metrics, pre_computes)
+        try:
+            yield None
+        finally:
+            _WORKER_STATE.clear()
+        return
+
+    with Pool(
+        processes=workers,
+        initializer=_initialize_worker,
+        initargs=(graph, metrics, pre_computes),
+    ) as pool:
+        yield pool
+
+
+def _split_into_blocks(
+    graphlet_occurrences: OccurrenceChunk, workers: int
+) -> List[OccurrenceChunk]:
+    """Split occurrences into contiguous blocks, so that each worker receives a few tasks."""
+    block_count = max(1, workers * _BLOCKS_PER_WORKER)
+    block_size = max(1, -(-len(graphlet_occurrences) // block_count))
+    return [
+        graphlet_occurrences[start : start + block_size]
+        for start in range(0, len(graphlet_occurrences), block_size)
+    ]
+
+
+def _calculate_metric_blocks(
+    pool: Optional[Pool], metric_name: str, blocks: List[OccurrenceChunk]
+) -> List[RawMetric]:
+    """Calculate a metric on all blocks of a chunk, in the pool if given."""
+    args = [(metric_name, block) for block in blocks]
+    if pool is None:
+        block_results = starmap(_calculate_metric_block, args)
+    else:
+        block_results = pool.starmap(_calculate_metric_block, args)
+    return [g_m for block_result in block_results for g_m in block_result]
+
+
+def _calculate_metric_block(
+    metric_name: str, graphlet_occurrences: OccurrenceChunk
+) -> List[RawMetric]:
+    """Calculate a metric on a block of occurrences with its batch method,
+    using the state of the current process."""
+    metric: PMetric = _WORKER_STATE["metrics"][metric_name]
+    graph: nx.Graph = _WORKER_STATE["graph"]
+    pre_compute: PreComputation = _WORKER_STATE["pre_computes"][metric_name]
+    block_result = metric.metric_calculation_batch(
+        graph, graphlet_occurrences, pre_compute
+    )
+    if isinstance(block_result, np.ndarray):
+        # Raw metrics have to stay json serializable
+        return block_result.tolist()
+    return block_result
+
+
+def _as_chunks(
+    graphlet_occurrences: GraphletOccurrenceInput,
+    node_id_mapping: Optional[NodeIdMapping],
+) -> Iterable[OccurrenceChunk]:
+    """Turn any accepted graphlet occurrence input into an iterable of chunks.
+    Given a node id mapping, chunks are stores interned by it (see `with_node_ids`),
+    otherwise lists of occurrences are kept, as their labels do not need to be integers."""
+    if isinstance(graphlet_occurrences, GraphletOccurrenceStore):
+        return [_intern_chunk(graphlet_occurrences, node_id_mapping)]
+    if isinstance(graphlet_occurrences, list) and all(
+        isinstance(g_oc, GraphletOccurrence) for g_oc in graphlet_occurrences
+    ):
+        if node_id_mapping is None:
+            return [graphlet_occurrences]
+        return [
+            GraphletOccurrenceStore.from_occurrences(graphlet_occurrences).with_node_ids(
+                node_id_mapping
+            )
+        ]
+    if isinstance(graphlet_occurrences, list):
+        return [_intern_chunk(chunk, node_id_mapping) for chunk in graphlet_occurrences]
+    return (_intern_chunk(chunk, node_id_mapping) for chunk in graphlet_occurrences)
+
+
+def _intern_chunk(
+    chunk: GraphletOccurrenceStore, node_id_mapping: Optional[NodeIdMapping]
+) -> GraphletOccurrenceStore:
+    """Intern a chunk, unless it is already interned, e.g. while it was read."""
+    if node_id_mapping is None or chunk.node_ids is not None:
+        return chunk
+    return chunk.with_node_ids(node_id_mapping)
+
+
 def calculate_metrics(
     pmotif_graph: PMotifGraph,
     graphlet_size: int,
     metrics: List[PMetric],
     save_to_disk: bool = True,
     workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    resume: bool = False,
+    artifacts: Optional[GraphArtifactCache] = None,
+    storage: str = JSON_STORAGE,
 ) -> List[PMetricResult]:
     """When pointed to a graph and a motif file, unzips the motif file, reads the graphs,
      and calculates given positional metrics.
      Can save results directly to disk.
+     Graphlet occurrences are streamed from disk in chunks of `chunk_size` occurrences.
+     When saving to disk, each metric is stored in its own directory, and its progress is
+     checkpointed after every chunk (see `MetricCheckpoint`). With `resume`, metrics already
+     stored are loaded instead of calculated, and interrupted calculations continue after
+     their last stored chunk, which requires the same `chunk_size`. Without `resume`,
+     an existing metric directory raises a FileExistsError.
+     Pass a cache of the graph as `artifacts` to share its artifacts with other calls,
+     or to load them from disk (see `GraphArtifactCache.for_pmotif_graph`). Otherwise, array
+     artifacts are read from the edgelist in bulk, and the graph is only loaded as networkx graph
+     (keeping self loops) if a metric needs it.
+     `storage` selects the format of stored graphlet metrics (see `PMetricResult`).
     Returns a list of the results as PMetricResult objects."""
-    graph = nx.readwrite.edgelist.read_edgelist(
-        pmotif_graph.get_graph_path(), data=False, create_using=nx.Graph
+    if storage not in (JSON_STORAGE, BINARY_STORAGE):
+        raise ValueError(f"Unknown graphlet metric storage {storage}!")
+    if artifacts is None:
+        artifacts = GraphArtifactCache(
+            source=pmotif_graph.get_graph_path(),
+            graph_loader=partial(
+                read_edgelist, pmotif_graph.get_graph_path(), remove_self_loops=False
+            ),
+        )
+    if save_to_disk:
+        return _calculate_metrics_with_checkpoints(
+            pmotif_graph,
+            artifacts,
+            graphlet_size,
+            metrics,
+            workers,
+            chunk_size,
+            resume,
+            storage,
+        )
+
+    graphlet_occurrences = pmotif_graph.iter_graphlet_occurrences(
+        graphlet_size,
+        chunk_size,
+        node_id_mapping=_get_node_id_mapping(artifacts, metrics, workers),
     )
-    graphlet_occurrences: List[GraphletOccurrence] = pmotif_graph.load_graphlet_pos_zip(
-        graphlet_size
+    return process_graphlet_occurrences(
+        None, graphlet_occurrences, metrics, workers=workers, artifacts=artifacts,
     )
 
-    metric_result_lookup = process_graphlet_occurrences(
-        graph, graphlet_occurrences, metrics, workers=workers,
-    )
-    if save_to_disk:
-        metric_output = pmotif_graph.get_pmetric_directory(graphlet_size)
-        makedirs(metric_output)
-        for metric_result in metric_result_lookup:
-            metric_result.save_to_disk(metric_output)
 
-    return metric_result_lookup
+def _calculate_metrics_with_checkpoints(
+    pmotif_graph: PMotifGraph,
+    artifacts: GraphArtifactCache,
+    graphlet_size: int,
+    metrics: List[PMetric],
+    workers: int,
+    chunk_size: int,
+    resume: bool,
+    storage: str,
+) -> List[PMetricResult]:
+    """Calculate the metrics which are not stored yet, chunk by chunk,
+    storing the graphlet metrics of each chunk in the checkpoint of its metric.
+    Chunks are only read from the first chunk which is missing for any metric."""
+    metric_output = pmotif_graph.get_pmetric_directory(graphlet_size)
+    checkpoints = {
+        m.name: MetricCheckpoint(metric_output / m.name, chunk_size) for m in metrics
+    }
+    if not resume:
+        for checkpoint in checkpoints.values():
+            if checkpoint.output.exists():
+                raise FileExistsError(
+                    f"Metric output {checkpoint.output} already exists!"
+                )
+    pending = [m for m in metrics if not checkpoints[m.name].is_complete]
+
+    pre_computes: Dict[str, PreComputation] = {}
+    completed_chunks: Dict[str, int] = {}
+    graphlet_metrics: Dict[str, List[RawMetric]] = {}
+    for metric in tqdm(pending, desc="Pre-computing metrics", leave=False):
+        checkpoint = checkpoints[metric.name]
+        checkpoint.start()
+        pre_computes[metric.name] = checkpoint.load_pre_compute()
+        if pre_computes[metric.name] is None:
+            pre_computes[metric.name] = metric.artifact_pre_computation(
+                artifacts, workers
+            )
+            checkpoint.save_pre_compute(pre_computes[metric.name])
+        completed_chunks[metric.name] = checkpoint.completed_chunks()
+        graphlet_metrics[metric.name] = checkpoint.load_chunks(
+            completed_chunks[metric.name]
+        )
+
+    if len(pending) > 0:
+        first_chunk = min(completed_chunks.values())
+        chunks = islice(
+            pmotif_graph.iter_graphlet_occurrences(
+                graphlet_size,
+                chunk_size,
+                node_id_mapping=_get_node_id_mapping(artifacts, pending, workers),
+            ),
+            first_chunk,
+            None,
+        )
+        worker_graph = _get_worker_graph(artifacts, pending)
+        with _create_pool(worker_graph, pending, pre_computes, workers) as pool, tqdm(
+            desc="Graphlet Occurrence Progress", leave=False
+        ) as pbar:
+            for chunk_index, chunk in enumerate(chunks, first_chunk):
+                blocks = _split_into_blocks(chunk, workers)
+                for metric in pending:
+                    if chunk_index < completed_chunks[metric.name]:
+                        continue
+                    chunk_metrics = _calculate_metric_blocks(pool, metric.name, blocks)
+                    checkpoints[metric.name].save_chunk(chunk_index, chunk_metrics)
+                    graphlet_metrics[metric.name].extend(chunk_metrics)
+                pbar.update(len(chunk))
+
+    results = []
+    for metric in metrics:
+        checkpoint = checkpoints[metric.name]
+        if metric in pending:
+            metric_result = PMetricResult(
+                metric_name=metric.name,
+                pre_compute=pre_computes[metric.name],
+                graphlet_metrics=graphlet_metrics[metric.name],
+            )
+            checkpoint.finish(metric_result, storage)
+        else:
+            metric_result = PMetricResult.load_from_disk(
+                checkpoint.output, supress_tqdm=True
+            )
+        results.append(metric_result)
+    return results
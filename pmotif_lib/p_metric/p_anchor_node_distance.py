@@ -1,9 +1,18 @@
 """Pre-Implemented PMetric to calculate the distance of a graphlet to network hubs."""
-import statistics
 from typing import List, Dict
 
 import networkx as nx
-
+import numpy as np
+
+from pmotif_lib.graph_artifacts import (
+    HUB_DISTANCES,
+    HUBS,
+    NODE_LABELS,
+    GraphArtifactCache,
+    get_hubs,
+)
+from pmotif_lib.graphlet_occurence import GraphletOccurrenceStore
+from pmotif_lib.node_ids import NodeIdMapping
 from pmotif_lib.p_metric.p_metric import PMetric, PreComputation
 
 
@@ -13,6 +22,8 @@ class PAnchorNodeDistance(PMetric):
     The distance of a graphlet to a node is defined as the smallest distance between any
     node of the graphlet to the anchor node."""
 
+    BATCH_USES_GRAPH = False
+
     def __init__(self):
         super().__init__("pAnchorNodeDistance")
 
@@ -21,35 +32,36 @@ class PAnchorNodeDistance(PMetric):
         """Return hubs of a networkx graph. Nodes with a degree higher than one standard deviations
         above the mean degree are considered hubs.
         """
-        degrees = dict(graph.degree)
-
-        degree_mean = statistics.mean(degrees.values())
-        degree_stdev = statistics.stdev(degrees.values())
-
-        return [
-            node
-            for node, degree in degrees.items()
-            if degree > degree_mean + degree_stdev
-        ]
-
-    def pre_computation(self, graph: nx.Graph) -> PreComputation:
-        """Pre-compute anchor nodes and their shortest paths lookup"""
-        anchor_nodes = PAnchorNodeDistance.get_hubs(graph)
+        return get_hubs(graph)
+
+    def artifact_pre_computation(
+        self, artifacts: GraphArtifactCache, workers: int = 1
+    ) -> PreComputation:
+        """Pre-compute anchor nodes and a dense (n_anchor_nodes x n_node_ids) distance matrix,
+        indexed by node id (see `NodeIdMapping`), holding -1 for unreachable nodes.
+        Requests the hubs of the graph as anchor nodes, and their distance matrix, from the
+        artifacts of the graph, splitting the BFS from each anchor node across `workers`
+        processes"""
+        anchor_nodes = artifacts.get(HUBS, workers=workers)
+        anchor_distances = artifacts.get(HUB_DISTANCES, workers=workers)
 
-        nodes_shortest_path_lookup = {
-            anchor_node: nx.single_source_shortest_path_length(graph, anchor_node)
-            for anchor_node in anchor_nodes
-        }
-
-        closeness_centrality = {
-            anchor_node: statistics.mean(shortest_path_lookup.values())
-            for anchor_node, shortest_path_lookup in nodes_shortest_path_lookup.items()
+        return {
+            "anchor_nodes": anchor_nodes,
+            "anchor_distances": anchor_distances,
+            "node_labels": artifacts.get(NODE_LABELS, workers=workers),
+            "closeness_centrality": PAnchorNodeDistance.get_closeness_centrality(
+                anchor_nodes, anchor_distances
+            ),
         }
 
+    @staticmethod
+    def get_closeness_centrality(
+        anchor_nodes: List[str], anchor_distances: np.ndarray
+    ) -> Dict[str, float]:
+        """Return the mean distance of each anchor node to all nodes reachable from it."""
         return {
-            "anchor_nodes": anchor_nodes,
-            "nodes_shortest_path_lookup": nodes_shortest_path_lookup,
-            "closeness_centrality": closeness_centrality,
+            anchor_node: float(distances[distances >= 0].mean(dtype=np.float64))
+            for anchor_node, distances in zip(anchor_nodes, anchor_distances)
         }
 
     def metric_calculation(
@@ -60,24 +72,44 @@ class PAnchorNodeDistance(PMetric):
     ) -> List[int]:
         """Calculate the shortest path from any node in the graphlet occurrence
         to each of the anchor nodes."""
-        path_lengths = []
+        node_ids = NodeIdMapping(pre_compute["node_labels"]).to_ids(
+            np.array([[int(node) for node in graphlet_nodes]])
+        )
+        return self._get_anchor_distances(node_ids, pre_compute)[0].tolist()
 
-        shortest_path_lookup: Dict[str, int]
-        for shortest_path_lookup in pre_compute["nodes_shortest_path_lookup"].values():
-            distances = [
-                shortest_path_lookup[node]
-                for node in graphlet_nodes
-                if node in shortest_path_lookup
-            ]
+    def metric_calculation_batch(
+        self,
+        graph: nx.Graph,
+        graphlet_occurrences: GraphletOccurrenceStore,
+        pre_compute: PreComputation,
+    ) -> np.ndarray:
+        """Calculate the shortest path from any node to each of the anchor nodes
+        for all graphlet occurrences at once."""
+        return self._get_anchor_distances(
+            graphlet_occurrences.get_node_ids(pre_compute["node_labels"]), pre_compute
+        )
+
+    @staticmethod
+    def _get_anchor_distances(
+        node_matrix: np.ndarray, pre_compute: PreComputation
+    ) -> np.ndarray:
+        """Return a (n_occurrences x n_anchor_nodes) matrix holding the smallest distance between
+        any node of an occurrence (given by node ids) and each anchor node."""
+        anchor_distances: np.ndarray = pre_compute["anchor_distances"]
+        path_lengths = np.empty(
+            (len(node_matrix), len(anchor_distances)), dtype=anchor_distances.dtype
+        )
+        for i, distances in enumerate(anchor_distances):
+            node_distances = distances[node_matrix]
             # A graphlet is assumed to always be connected
             # Therefore, there either is a path to an anchor node from each graphlet node,
             # or no path from either graphlet node.
             # Also, the distance between nodes can be at minimum 0 (if the nodes are identical).
             # Therefore, if we can not find any distance, we set it to -1, symbolizing "unreachable"
-            if len(distances) == 0:
-                distances = [-1]
-
-            path_lengths.append(min(distances))
+            unreachable = node_distances < 0
+            node_distances[unreachable] = np.iinfo(node_distances.dtype).max
+            path_lengths[:, i] = node_distances.min(axis=1)
+            path_lengths[unreachable.all(axis=1), i] = -1
         return path_lengths
 
     @staticmethod
@@ -1,7 +1,11 @@
 """Pre-Implemented PMetric to calculate the degree of a graphlet."""
 from typing import List
 import networkx as nx
+import numpy as np
 
+from pmotif_lib.graph_artifacts import DEGREES, NODE_LABELS, GraphArtifactCache
+from pmotif_lib.graphlet_occurence import GraphletOccurrenceStore
+from pmotif_lib.graphlet_representation import get_graphlet_edge_count_from_class
 from pmotif_lib.p_metric.p_metric import PMetric, PreComputation
 
 
@@ -10,6 +14,8 @@ class PDegree(PMetric):
     Graphlet degree is defined as the number of edges connecting a graphlet node to a non-graphlet
     node."""
 
+    BATCH_USES_GRAPH = False
+
     def __init__(self):
         super().__init__("pDegree")
 
@@ -32,6 +38,35 @@ class PDegree(PMetric):
             external_degree += 1
         return external_degree
 
-    def pre_computation(self, graph: nx.Graph) -> PreComputation:
-        """No pre-computation necessary for degree calculation"""
-        return {}
+    def metric_calculation_batch(
+        self,
+        graph: nx.Graph,
+        graphlet_occurrences: GraphletOccurrenceStore,
+        pre_compute: PreComputation,
+    ) -> np.ndarray:
+        """Each edge leaving the graphlet is counted once in the degree of its graphlet node,
+        each edge within the graphlet twice. Therefore, the graphlet degree is the sum of its node
+        degrees minus twice the edge count of its graphlet class."""
+        class_edge_counts = np.array(
+            [
+                get_graphlet_edge_count_from_class(graphlet_class)
+                for graphlet_class in graphlet_occurrences.graphlet_classes
+            ],
+            dtype=np.int64,
+        )
+        degrees = pre_compute["degrees"]
+        node_ids = graphlet_occurrences.get_node_ids(pre_compute["node_labels"])
+        return (
+            degrees[node_ids].sum(axis=1)
+            - 2 * class_edge_counts[graphlet_occurrences.graphlet_class_ids]
+        )
+
+    def artifact_pre_computation(
+        self, artifacts: GraphArtifactCache, workers: int = 1
+    ) -> PreComputation:
+        """Request the degree of each node id, and the labels of the node ids,
+        from the artifacts of the graph"""
+        return {
+            "degrees": artifacts.get(DEGREES, workers=workers),
+            "node_labels": artifacts.get(NODE_LABELS, workers=workers),
+        }
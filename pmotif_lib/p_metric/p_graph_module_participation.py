@@ -1,23 +1,75 @@
 """Pre-Implemented PMetric to calculate the number of graph modules a graphlet touches."""
-from typing import List
+from typing import List, Optional
 import networkx as nx
-from networkx.algorithms.community import greedy_modularity_communities
+import numpy as np
 
+from pmotif_lib.community_detection import CommunityDetection, greedy_modularity
+from pmotif_lib.graph_artifacts import NODE_LABELS, GraphArtifactCache
+from pmotif_lib.graphlet_occurence import GraphletOccurrenceStore
+from pmotif_lib.node_ids import NodeIdMapping
 from pmotif_lib.p_metric.p_metric import PMetric, PreComputation
 
 
 class PGraphModuleParticipation(PMetric):
     """Measures how many unique graph modules a graphlet participates in.
-    Graph modules are calculated using greedy modularity optimization.
+    Graph modules are calculated using the given community detection backend
+    (see `pmotif_lib.community_detection`), greedy modularity optimization by default.
+    Faster backends, such as `label_propagation`, find other modules, so they are opt-in.
     A graphlet participates in a module, if at least one graphlet node belongs to that module.
     """
 
-    def __init__(self):
+    BATCH_USES_GRAPH = False
+
+    def __init__(self, community_detection: CommunityDetection = greedy_modularity):
         super().__init__("pGraphModuleParticipation")
+        self.community_detection = community_detection
+
+    def artifact_pre_computation(
+        self, artifacts: GraphArtifactCache, workers: int = 1
+    ) -> PreComputation:
+        """Calculates graph modules with the community detection backend,
+        and a lookup from each node id to the index of its module.
+        Requests the graph modules of the community detection backend from the artifacts
+        of the graph, if the backend is a named function, and calculates the node lookup.
+        The graph is only loaded if the modules are neither in memory nor stored."""
+        artifact_name = self._get_graph_modules_artifact_name()
+        if artifact_name is None:
+            graph_modules = self.community_detection(artifacts.graph)
+        else:
+            graph_modules = artifacts.get(
+                artifact_name,
+                lambda cache, _: self.community_detection(cache.graph),
+                workers=workers,
+            )
+        node_labels = artifacts.get(NODE_LABELS, workers=workers)
+        return {
+            "graph_modules": graph_modules,
+            "node_modules": PGraphModuleParticipation.get_node_modules(
+                graph_modules, NodeIdMapping(node_labels)
+            ),
+            "node_labels": node_labels,
+        }
 
-    def pre_computation(self, graph: nx.Graph) -> PreComputation:
-        """Calculates graph modules with a greedy modularity approach."""
-        return {"graph_modules": list(map(list, greedy_modularity_communities(graph)))}
+    def _get_graph_modules_artifact_name(self) -> Optional[str]:
+        """Name the graph modules after the qualified name of the backend.
+        Lambdas and configured backends (e.g. partials) can not be told apart by name,
+        so their modules are not shared."""
+        qualname = getattr(self.community_detection, "__qualname__", None)
+        if qualname is None or "<" in qualname:
+            return None
+        return f"graph_modules_{self.community_detection.__module__}.{qualname}"
+
+    @staticmethod
+    def get_node_modules(
+        graph_modules: List[List[str]], node_id_mapping: NodeIdMapping
+    ) -> np.ndarray:
+        """Return the module index of each node id, -1 for nodes without a module."""
+        node_modules = np.full(len(node_id_mapping), -1, dtype=np.int32)
+        for i, graph_module in enumerate(graph_modules):
+            node_modules[
+                node_id_mapping.to_ids(np.array([int(node) for node in graph_module]))
+            ] = i
+        return node_modules
 
     def metric_calculation(
         self,
@@ -27,10 +79,29 @@ class PGraphModuleParticipation(PMetric):
     ) -> List[int]:
         """Returns a list of indices
         indicating which modules contain nodes of the graphlet occurrence."""
-        participations = []
-        for i, graph_module in enumerate(pre_compute["graph_modules"]):
-            for node in graphlet_nodes:
-                if node in graph_module:
-                    participations.append(i)
-                    break
-        return participations
+        node_ids = NodeIdMapping(pre_compute["node_labels"]).to_ids(
+            np.array([int(node) for node in graphlet_nodes])
+        )
+        node_modules = pre_compute["node_modules"]
+        return sorted({int(node_modules[node_id]) for node_id in node_ids.tolist()} - {-1})
+
+    def metric_calculation_batch(
+        self,
+        graph: nx.Graph,
+        graphlet_occurrences: GraphletOccurrenceStore,
+        pre_compute: PreComputation,
+    ) -> List[List[int]]:
+        """Returns the module indices of each graphlet occurrence,
+        looking up the modules of all nodes at once and keeping the unique ones per occurrence."""
+        node_ids = graphlet_occurrences.get_node_ids(pre_compute["node_labels"])
+        modules = np.sort(pre_compute["node_modules"][node_ids], axis=1)
+        is_unique = modules >= 0
+        is_unique[:, 1:] &= modules[:, 1:] != modules[:, :-1]
+
+        participations = modules[is_unique].tolist()
+        offsets = np.zeros(len(modules) + 1, dtype=np.int64)
+        np.cumsum(is_unique.sum(axis=1), out=offsets[1:])
+        offsets = offsets.tolist()
+        return [
+            participations[start:end] for start, end in zip(offsets[:-1], offsets[1:])
+        ]
@@ -1,8 +1,12 @@
 """Abstract class defining the interface of a positional metric."""
 from abc import abstractmethod, ABC
-from typing import Any, Dict, List, TypeVar
+from typing import Any, Dict, List, TypeVar, Union
 
 import networkx as nx
+import numpy as np
+
+from pmotif_lib.graph_artifacts import GraphArtifactCache
+from pmotif_lib.graphlet_occurence import GraphletOccurrenceStore
 
 RawMetric = TypeVar("RawMetric")
 PreComputation = Dict[str, Any]
@@ -15,6 +19,11 @@ class PMetric(ABC):
 
     EXISTING_METRIC_NAMES = set()
 
+    # Whether `metric_calculation_batch` uses its `graph` argument. Metrics which calculate
+    # batches from their pre-compute alone set this to False, then the metric processing
+    # passes None, and loads the graph only if the pre-computation needs it.
+    BATCH_USES_GRAPH = True
+
     def __init__(self, name: str):
         if name in PMetric.EXISTING_METRIC_NAMES:
             raise ValueError(f"Metric with name {name} already exists!")
@@ -25,7 +34,6 @@ class PMetric(ABC):
         """Return the name of the metric."""
         return self._name
 
-    @abstractmethod
     def pre_computation(self, graph: nx.Graph) -> PreComputation:
         """Pre-compute data needed in each metric calculation.
         Is called before any metric calculation on individual graphlets. This can vastly speed up
@@ -34,7 +42,31 @@ class PMetric(ABC):
 
         Return value of this method is fed into the `metric_calculation` method
         via the `pre_compute` argument.
+        Kept for metrics which only need the graph, override `artifact_pre_computation` instead.
+        By default, calls `artifact_pre_computation` on a cache of `graph`.
+        """
+        if type(self).artifact_pre_computation is PMetric.artifact_pre_computation:
+            raise NotImplementedError(
+                f"{type(self).__name__} implements neither pre-computation method!"
+            )
+        return self.artifact_pre_computation(GraphArtifactCache(graph))
+
+    def artifact_pre_computation(
+        self, artifacts: GraphArtifactCache, workers: int = 1
+    ) -> PreComputation:
+        """Pre-compute data needed in each metric calculation from the artifacts of the graph,
+        using up to `workers` processes. Is called by the metric processing, with a cache shared
+        by all metrics of the graph. Override to request artifacts, such as degrees or
+        BFS distances, which are then computed only once per graph (see `GraphArtifactCache`),
+        or to split up expensive pre-computations. By default,
+        calls `pre_computation` on the graph of the cache.
         """
+        del workers
+        if type(self).pre_computation is PMetric.pre_computation:
+            raise NotImplementedError(
+                f"{type(self).__name__} implements neither pre-computation method!"
+            )
+        return self.pre_computation(artifacts.graph)
 
     @abstractmethod
     def metric_calculation(
@@ -46,3 +78,21 @@ class PMetric(ABC):
         """Is called on each graphlet occurrence to compute the positional metric.
         Can return any type, but has to be json serializable.
         """
+
+    def metric_calculation_batch(
+        self,
+        graph: nx.Graph,
+        graphlet_occurrences: GraphletOccurrenceStore,
+        pre_compute: PreComputation,
+    ) -> Union[List[RawMetric], np.ndarray]:
+        """Is called on a block of graphlet occurrences to compute the positional metric of each.
+        Returns one raw metric per occurrence, in order, either as list or as array with one row
+        per occurrence.
+        Override to process the whole node matrix (`graphlet_occurrences.nodes`) at once,
+        avoiding the per-occurrence call overhead. By default, calls `metric_calculation`
+        on each occurrence.
+        """
+        return [
+            self.metric_calculation(graph, g_oc.nodes, pre_compute)
+            for g_oc in graphlet_occurrences
+        ]
@@ -1,40 +1,66 @@
 """Handle the disk storing and loading of PMetric calculations (pre-compute and results)."""
 import json
 import os
+import shutil
+from contextlib import contextmanager
 from dataclasses import dataclass
+from itertools import chain
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Optional, TextIO, Union
 
+import numpy as np
 from tqdm import tqdm
 
 from pmotif_lib.p_metric.p_metric import PreComputation, RawMetric
 
+NPY_SUFFIX = ".npy"
+
+# Storage formats of the graphlet metrics
+JSON_STORAGE = "json"
+BINARY_STORAGE = "binary"
+
+GRAPHLET_METRICS_FILE = "graphlet_metrics"
+GRAPHLET_METRICS_ARRAY_FILE = "graphlet_metrics.npy"
+GRAPHLET_METRICS_VALUES_FILE = "graphlet_metrics_values.npy"
+GRAPHLET_METRICS_OFFSETS_FILE = "graphlet_metrics_offsets.npy"
+
+CHECKPOINT_DIRECTORY = "checkpoint"
+CHECKPOINT_HEADER_FILE = "checkpoint.json"
+
 
 @dataclass
 class PMetricResult:
     """Stores and loads PMetrics to disk. Creates a directory for each metric,
     containing the `graphlet_metrics` in a file, and a subdirectory `pre_compute`,
-    with a file for each pre-compute key. Uses json and utf-8."""
+    with a file for each pre-compute key. Uses json and utf-8, pre-computed numpy arrays are
+    stored as `.npy` files.
+    With BINARY_STORAGE, numeric graphlet metrics of a fixed shape are stored as one array
+    (`graphlet_metrics.npy`), numeric lists of varying length as their concatenated values
+    and the offset of each list (`graphlet_metrics_values.npy`, `graphlet_metrics_offsets.npy`).
+    Integers are stored in the smallest fitting dtype. Other graphlet metrics fall back to json."""
 
     metric_name: str
     pre_compute: PreComputation
     graphlet_metrics: List[RawMetric]
 
-    def save_to_disk(self, output: Path):
-        """Stores pre_calculations to a specific path."""
+    def save_to_disk(self, output: Path, storage: str = JSON_STORAGE):
+        """Stores pre_calculations to a specific path.
+        `storage` selects the format of the graphlet metrics, JSON_STORAGE or BINARY_STORAGE."""
+        if storage not in (JSON_STORAGE, BINARY_STORAGE):
+            raise ValueError(f"Unknown graphlet metric storage {storage}!")
         if output.name != self.metric_name:
             output = output / self.metric_name
 
-        # Store pre_compute
-        os.makedirs(output / "pre_compute")
-        for pre_compute_name, pre_compute_value in self.pre_compute.items():
-            pre_compute_filepath = output / "pre_compute" / pre_compute_name
-            with open(pre_compute_filepath, "w", encoding="utf-8") as pre_compute_file:
-                json.dump(pre_compute_value, pre_compute_file)
+        PMetricResult._save_pre_compute(self.pre_compute, output / "pre_compute")
+
+        if storage == BINARY_STORAGE and PMetricResult._save_graphlet_metrics_binary(
+            self.graphlet_metrics, output
+        ):
+            return
 
         # Store graphlet_metrics
         with open(
-            output / "graphlet_metrics", "w", encoding="utf-8"
+            output / GRAPHLET_METRICS_FILE, "w", encoding="utf-8"
         ) as graphlet_metrics_file:
             graphlet_metrics_file.write(
                 f"{len(self.graphlet_metrics)}\n"
@@ -43,17 +69,90 @@ class PMetricResult:
                 graphlet_metrics_file.write(json.dumps(g_m))
                 graphlet_metrics_file.write("\n")
 
+    @staticmethod
+    def _save_graphlet_metrics_binary(
+        graphlet_metrics: List[RawMetric], output: Path
+    ) -> bool:
+        """Stores numeric graphlet metrics of a fixed shape as one array,
+        numeric lists of varying length as values and offsets.
+        Returns False, without storing anything, for any other graphlet metrics."""
+        try:
+            metric_array = np.array(graphlet_metrics)
+        except ValueError:
+            # Inhomogeneous shapes, i.e. lists of varying length
+            metric_array = None
+        if metric_array is not None and metric_array.dtype.kind in "biuf":
+            np.save(output / GRAPHLET_METRICS_ARRAY_FILE, _downcast(metric_array))
+            return True
+
+        if not all(isinstance(g_m, (list, tuple)) for g_m in graphlet_metrics):
+            return False
+        try:
+            values = np.array(list(chain.from_iterable(graphlet_metrics)))
+        except ValueError:
+            return False
+        if values.ndim != 1 or values.dtype.kind not in "biuf":
+            return False
+        offsets = np.zeros(len(graphlet_metrics) + 1, dtype=np.int64)
+        np.cumsum([len(g_m) for g_m in graphlet_metrics], out=offsets[1:])
+        np.save(output / GRAPHLET_METRICS_VALUES_FILE, _downcast(values))
+        np.save(output / GRAPHLET_METRICS_OFFSETS_FILE, _downcast(offsets))
+        return True
+
+    @staticmethod
+    def _save_pre_compute(pre_compute: PreComputation, pre_compute_dir: Path):
+        """Stores all pre_compute values in pre_compute_dir"""
+        os.makedirs(pre_compute_dir)
+        for pre_compute_name, pre_compute_value in pre_compute.items():
+            pre_compute_filepath = pre_compute_dir / pre_compute_name
+            if isinstance(pre_compute_value, np.ndarray):
+                np.save(
+                    pre_compute_dir / f"{pre_compute_name}{NPY_SUFFIX}",
+                    pre_compute_value,
+                )
+                continue
+            with open(pre_compute_filepath, "w", encoding="utf-8") as pre_compute_file:
+                json.dump(pre_compute_value, pre_compute_file)
+
     @staticmethod
     def load_from_disk(output: Path, supress_tqdm: bool = False):
-        """Loads metric results stored at output."""
+        """Loads metric results stored at output, in either storage format."""
+        graphlet_metrics = PMetricResult.load_graphlet_metrics(output, supress_tqdm)
+        if isinstance(graphlet_metrics, np.ndarray):
+            graphlet_metrics = graphlet_metrics.tolist()
         return PMetricResult(
             metric_name=output.name,
-            pre_compute=PMetricResult._load_pre_compute(output / "pre_compute"),
-            graphlet_metrics=PMetricResult._load_graphlet_metrics(
-                output / "graphlet_metrics", supress_tqdm
-            ),
+            pre_compute=PMetricResult.load_pre_compute(output),
+            graphlet_metrics=graphlet_metrics,
+        )
+
+    @staticmethod
+    def load_pre_compute(output: Path) -> PreComputation:
+        """Loads only the pre-compute of the metric results stored at output."""
+        return PMetricResult._load_pre_compute(output / "pre_compute")
+
+    @staticmethod
+    def load_graphlet_metrics(
+        output: Path, supress_tqdm: bool = False
+    ) -> Union[np.ndarray, List[RawMetric]]:
+        """Loads only the graphlet metrics of the metric results stored at output.
+        Returns graphlet metrics stored as one array (see BINARY_STORAGE) as that array,
+        with one row per graphlet occurrence, and a list otherwise."""
+        if (output / GRAPHLET_METRICS_ARRAY_FILE).is_file():
+            return np.load(output / GRAPHLET_METRICS_ARRAY_FILE)
+        if (output / GRAPHLET_METRICS_VALUES_FILE).is_file():
+            return PMetricResult._load_ragged_graphlet_metrics(output)
+        return PMetricResult._load_graphlet_metrics(
+            output / GRAPHLET_METRICS_FILE, supress_tqdm
         )
 
+    @staticmethod
+    def _load_ragged_graphlet_metrics(output: Path) -> List[RawMetric]:
+        """Split the stored values into the list of each graphlet occurrence"""
+        values = np.load(output / GRAPHLET_METRICS_VALUES_FILE).tolist()
+        offsets = np.load(output / GRAPHLET_METRICS_OFFSETS_FILE).tolist()
+        return [values[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
     @staticmethod
     def _load_pre_compute(pre_compute_dir: Path) -> PreComputation:
         """Loads all pre_compute values found at pre_compute_dir"""
@@ -61,6 +160,11 @@ class PMetricResult:
         for content in os.listdir(str(pre_compute_dir)):
             if not (pre_compute_dir / content).is_file():
                 continue
+            if content.endswith(NPY_SUFFIX):
+                pre_compute[content[: -len(NPY_SUFFIX)]] = np.load(
+                    pre_compute_dir / content
+                )
+                continue
             with open(
                 pre_compute_dir / content, "r", encoding="utf-8"
             ) as pre_compute_file:
@@ -83,3 +187,117 @@ class PMetricResult:
                 disable=supress_tqdm,
             )
             return [json.loads(line) for line in pbar]
+
+
+def _downcast(metric_array: np.ndarray) -> np.ndarray:
+    """Return an integer array in the smallest signed dtype holding its values."""
+    if metric_array.dtype.kind not in "iu" or metric_array.size == 0:
+        return metric_array
+    for dtype in (np.int8, np.int16, np.int32):
+        limits = np.iinfo(dtype)
+        if limits.min <= metric_array.min() and metric_array.max() <= limits.max:
+            return metric_array.astype(dtype)
+    return metric_array
+
+
+class MetricCheckpoint:
+    """Records the partial progress of a metric calculation next to its result, in the
+    `checkpoint` subdirectory of the metric directory: The pre-compute, and the graphlet
+    metrics of each finished chunk of graphlet occurrences in a file of json lines.
+    Files are written under a temporary name and renamed, so that a crash never leaves
+    a partially written checkpoint behind. The checkpoint is removed once the complete
+    result is stored, a metric directory without checkpoint holds a complete result."""
+
+    def __init__(self, output: Path, chunk_size: int):
+        self.output = output
+        self.chunk_size = chunk_size
+        self.directory = output / CHECKPOINT_DIRECTORY
+
+    @property
+    def is_complete(self) -> bool:
+        """Returns whether the complete result of the metric is stored."""
+        # The graphlet metrics are stored after the pre-compute, before removing the checkpoint
+        return (self.output / "pre_compute").is_dir() and not self.directory.exists()
+
+    def start(self):
+        """Create the checkpoint, or continue an existing one.
+        Chunks are only valid for the chunk size they were calculated with."""
+        header = {"chunk_size": self.chunk_size}
+        header_path = self.directory / CHECKPOINT_HEADER_FILE
+        if header_path.is_file():
+            with open(header_path, "r", encoding="utf-8") as header_file:
+                stored_chunk_size = json.load(header_file)["chunk_size"]
+            if stored_chunk_size != self.chunk_size:
+                raise ValueError(
+                    f"Checkpoint at {self.directory} was created with chunk size "
+                    f"{stored_chunk_size}, not {self.chunk_size}!"
+                )
+            return
+        os.makedirs(self.directory / "chunks", exist_ok=True)
+        with _atomic_open(header_path) as header_file:
+            json.dump(header, header_file)
+
+    def load_pre_compute(self) -> Optional[PreComputation]:
+        """Returns the stored pre-compute, None if it was not stored yet."""
+        if not (self.directory / "pre_compute").is_dir():
+            return None
+        return PMetricResult._load_pre_compute(self.directory / "pre_compute")
+
+    def save_pre_compute(self, pre_compute: PreComputation):
+        """Stores the pre-compute of the metric."""
+        temporary_dir = self.directory / "pre_compute.tmp"
+        if temporary_dir.exists():
+            shutil.rmtree(temporary_dir)
+        PMetricResult._save_pre_compute(pre_compute, temporary_dir)
+        os.replace(temporary_dir, self.directory / "pre_compute")
+
+    def completed_chunks(self) -> int:
+        """Returns the number of consecutive chunks, starting at the first, which are stored."""
+        count = 0
+        while self._chunk_path(count).is_file():
+            count += 1
+        return count
+
+    def save_chunk(self, index: int, graphlet_metrics: List[RawMetric]):
+        """Stores the graphlet metrics of the chunk at `index`."""
+        with _atomic_open(self._chunk_path(index)) as chunk_file:
+            for g_m in graphlet_metrics:
+                chunk_file.write(json.dumps(g_m))
+                chunk_file.write("\n")
+
+    def load_chunks(self, count: int) -> List[RawMetric]:
+        """Returns the graphlet metrics of the first `count` chunks, in order."""
+        graphlet_metrics = []
+        for index in range(count):
+            with open(self._chunk_path(index), "r", encoding="utf-8") as chunk_file:
+                graphlet_metrics.extend(json.loads(line) for line in chunk_file)
+        return graphlet_metrics
+
+    def finish(self, metric_result: PMetricResult, storage: str = JSON_STORAGE):
+        """Stores the complete result of the metric and removes the checkpoint.
+        Replaces files of an earlier attempt to store the result."""
+        if (self.output / "pre_compute").exists():
+            shutil.rmtree(self.output / "pre_compute")
+        for graphlet_metrics_file in (
+            GRAPHLET_METRICS_FILE,
+            GRAPHLET_METRICS_ARRAY_FILE,
+            GRAPHLET_METRICS_VALUES_FILE,
+            GRAPHLET_METRICS_OFFSETS_FILE,
+        ):
+            if (self.output / graphlet_metrics_file).exists():
+                os.remove(self.output / graphlet_metrics_file)
+        metric_result.save_to_disk(self.output, storage)
+        shutil.rmtree(self.directory)
+
+    def _chunk_path(self, index: int) -> Path:
+        return self.directory / "chunks" / f"{index:08d}"
+
+
+@contextmanager
+def _atomic_open(path: Path) -> Iterator[TextIO]:
+    """Open a text file for writing under a temporary name,
+    which is renamed to `path` once the file is written completely."""
+    temporary_path = path.with_name(f"{path.name}.tmp")
+    with open(temporary_path, "w", encoding="utf-8") as file:
+        yield file
+    os.replace(temporary_path, path)
@@ -1,19 +1,30 @@
 """Contains classes to manage disk locations of p-motif detection input, intermediate results,
 and output."""
 import zipfile
-from math import sqrt
+from multiprocessing import Pool
 from os import listdir, makedirs
 from pathlib import Path
-from typing import List, Dict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import networkx as nx
+import numpy as np
 from tqdm import tqdm
 
 from pmotif_lib.gtrieScanner import graph_io
 from pmotif_lib.gtrieScanner import parsing
-from pmotif_lib.graphlet_occurence import GraphletOccurrence
+from pmotif_lib.csr_graph import CSRGraph
+from pmotif_lib.graphlet_occurence import GraphletOccurrenceStore
+from pmotif_lib.node_ids import NodeIdMapping
 
-from pmotif_lib.randomization import swap_edges_markov_chain
+from pmotif_lib.randomization import (
+    ARRAY_ENGINE,
+    NETWORKX_ENGINE,
+    swap_edges_array,
+    swap_edges_markov_chain,
+)
+
+# Default number of graphlet occurrences held in memory at once when iterating occurrences
+DEFAULT_CHUNK_SIZE = 2**20
 
 
 class PMotifGraph:
@@ -32,6 +43,21 @@ class PMotifGraph:
         """Load the represented graph as nx.Graph object."""
         return graph_io.read_edgelist(self.get_graph_path())
 
+    def load_csr_graph(self) -> Tuple[CSRGraph, NodeIdMapping]:
+        """Load the represented graph as CSR adjacency, together with the mapping of its node
+        labels to node ids. Uses the binary sidecar of the edgelist, see `read_edgelist_csr`."""
+        return graph_io.read_edgelist_csr(self.get_graph_path())
+
+    def load_edgelist_stats(self) -> graph_io.EdgelistStats:
+        """Load the statistics of the edgelist of the represented graph, such as its smallest
+        node label. Uses the statistics sidecar of the edgelist, see `read_edgelist_stats`."""
+        return graph_io.read_edgelist_stats(self.get_graph_path())
+
+    def get_artifact_directory(self) -> Path:
+        """Return the directory next to the edgelist where artifacts derived from the graph
+        are stored, see `GraphArtifactCache`."""
+        return graph_io.get_artifact_directory(self.edgelist_path)
+
     def get_graphlet_directory(self) -> Path:
         """Return directory where all detected graphlets are stored."""
         return self.output_directory / (self.edgelist_path.name + "_motifs")
@@ -56,50 +82,77 @@ class PMotifGraph:
         containing all graphlet occurrences of all classes."""
         return self.get_graphlet_directory() / str(graphlet_size) / "motif_pos.zip"
 
+    def get_graphlet_pos_binary_directory(self, graphlet_size: int) -> Path:
+        """Return the location of the binary, memory-mappable graphlet occurrences,
+        which are stored instead of the compressed output-file if selected in gTrieScanner."""
+        return self.get_graphlet_directory() / str(graphlet_size) / "motif_pos_binary"
+
     def load_graphlet_pos_zip(
         self, graphlet_size: int, supress_tqdm: bool = False
-    ) -> List[GraphletOccurrence]:
-        """Returns all motifs in a lookup
-        from their index to their id (adj matrix string) and a list of their nodes"""
+    ) -> GraphletOccurrenceStore:
+        """Returns all graphlet occurrences in a columnar store,
+        holding their nodes and the id of their class (adj matrix string).
+        Memory-maps binary stored occurrences, if present, instead of parsing the zip."""
+        binary_directory = self.get_graphlet_pos_binary_directory(graphlet_size)
+        if binary_directory.is_dir():
+            return GraphletOccurrenceStore.load_from_disk(binary_directory)
+
         graphlet_count = sum(self.load_graphlet_freq_file(graphlet_size).values())
 
         with zipfile.ZipFile(self.get_graphlet_pos_zip(graphlet_size), "r") as zfile:
-            graphlets = []
-            graphlet_size = None
-            with zfile.open("motif_pos") as motif_pos_file:
-                for i, line in tqdm(
-                    enumerate(motif_pos_file),
-                    desc="Load Graphlet Positions",
-                    total=graphlet_count,
-                    leave=False,
-                    disable=supress_tqdm,
-                ):
-                    # Each line looks like this
-                    # '<adj.matrix written in one line>: <node1> <node2> ...'
-                    label, *nodes = line.decode().split(" ")
-                    label = label[:-1]  # Strip the trailing ':'
-
-                    # gtrieScanner reverses the adj matrix when saving occurrences
-                    label = label[::-1]
-
-                    if graphlet_size is None:
-                        graphlet_size = int(sqrt(len(label)))
-
-                    graphlet_class = " ".join(
-                        [
-                            label[i : i + graphlet_size]
-                            for i in range(
-                                0, graphlet_size * graphlet_size, graphlet_size
-                            )
-                        ]
-                    )
-                    graphlets.append(
-                        GraphletOccurrence(
-                            graphlet_class=graphlet_class,
-                            nodes=[n.strip() for n in nodes],
-                        )
-                    )
-            return graphlets
+            with zfile.open("motif_pos") as motif_pos_file, tqdm(
+                desc="Load Graphlet Positions",
+                total=graphlet_count,
+                leave=False,
+                disable=supress_tqdm,
+            ) as pbar:
+                return parsing.parse_graphlet_occurrences(
+                    motif_pos_file, graphlet_size, pbar=pbar
+                )
+
+    def iter_graphlet_occurrences(
+        self,
+        graphlet_size: int,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        supress_tqdm: bool = False,
+        node_id_mapping: Optional[NodeIdMapping] = None,
+    ) -> Iterator[GraphletOccurrenceStore]:
+        """Yields all graphlet occurrences in chunks of `chunk_size` occurrences,
+        reading them straight from the compressed output-file of gTrieScanner.
+        Only the current chunk is held in memory. The last chunk can be smaller.
+        Given a `node_id_mapping` of the graph, each chunk is interned by it as it is read
+        (see `GraphletOccurrenceStore.with_node_ids`)."""
+        for chunk in self._iter_graphlet_occurrence_chunks(
+            graphlet_size, chunk_size, supress_tqdm
+        ):
+            if node_id_mapping is not None:
+                chunk = chunk.with_node_ids(node_id_mapping)
+            yield chunk
+
+    def _iter_graphlet_occurrence_chunks(
+        self, graphlet_size: int, chunk_size: int, supress_tqdm: bool
+    ) -> Iterator[GraphletOccurrenceStore]:
+        binary_directory = self.get_graphlet_pos_binary_directory(graphlet_size)
+        if binary_directory.is_dir():
+            graphlet_occurrences = GraphletOccurrenceStore.load_from_disk(
+                binary_directory
+            )
+            for start in range(0, len(graphlet_occurrences), chunk_size):
+                yield graphlet_occurrences[start : start + chunk_size]
+            return
+
+        graphlet_count = sum(self.load_graphlet_freq_file(graphlet_size).values())
+
+        with zipfile.ZipFile(self.get_graphlet_pos_zip(graphlet_size), "r") as zfile:
+            with zfile.open("motif_pos") as motif_pos_file, tqdm(
+                desc="Load Graphlet Positions",
+                total=graphlet_count,
+                leave=False,
+                disable=supress_tqdm,
+            ) as pbar:
+                yield from parsing.iter_graphlet_occurrence_chunks(
+                    motif_pos_file, graphlet_size, chunk_size, pbar=pbar
+                )
 
     def get_pmetric_directory(self, graphlet_size: int) -> Path:
         """Return the directory to store p-metrics calculated on graphlets of the given size."""
@@ -133,24 +186,40 @@ class PMotifGraphWithRandomization(PMotifGraph):
         ]
 
     @staticmethod
-    def create_random_graph(graph: nx.Graph) -> nx.Graph:
-        """Method used to create random graphs. Overwrite to set your own random graph method"""
+    def create_random_graph(
+        graph: nx.Graph, engine: str = ARRAY_ENGINE, seed: Optional[int] = None
+    ) -> nx.Graph:
+        """Method used to create random graphs. Overwrite to set your own random graph method.
+        `engine` selects the edge swapping implementation, `ARRAY_ENGINE` or `NETWORKX_ENGINE`.
+        `graph` is left unchanged, the result is reproducible through `seed`."""
         swaps_per_edge = 3
         tries_per_swap = 10
-        return swap_edges_markov_chain(graph, swaps_per_edge, tries_per_swap)
+        if engine == ARRAY_ENGINE:
+            return swap_edges_array(graph, swaps_per_edge, tries_per_swap, seed)
+        if engine == NETWORKX_ENGINE:
+            return swap_edges_markov_chain(
+                graph.copy(), swaps_per_edge, tries_per_swap, seed
+            )
+        raise ValueError(f"Unknown edge swapping engine: {engine}")
 
     @staticmethod
     def create_from_pmotif_graph(
         pmotif_graph: PMotifGraph,
         num_random_graphs: int,
+        engine: str = ARRAY_ENGINE,
+        workers: int = 1,
+        seed: Optional[int] = None,
     ):
         """num_random_graphs determines how many random graphs are generated
         if num_random_graphs is >= 0 the call fails if random graphs are already present,
         otherwise, they are generated
         if num_random_graphs is -1, no additional graphs are generated,
         however, the already present random graphs will be used
+        engine selects the edge swapping implementation, see `create_random_graph`
+        workers sets the number of processes generating random graphs in parallel
+        seed determines a seed per random graph, so that the random graphs are reproducible
+        independent of the number of workers
         """
-        graph = pmotif_graph.load_graph()
         if num_random_graphs <= -1:
             # Do not generate additional graphs
             return PMotifGraphWithRandomization(
@@ -177,28 +246,66 @@ class PMotifGraphWithRandomization(PMotifGraph):
             )
 
         required_shift = 0
-        min_node = None
-        for node in graph.nodes:
-            if min_node is None:
-                min_node = int(node)
-            if int(node) < min_node:
-                min_node = int(node)
-
-        if min_node < 1:
+        min_node = pmotif_graph.load_edgelist_stats().min_node
+        if min_node is not None and min_node < 1:
             required_shift = abs(min_node) + 1
 
-        for i in tqdm(
-            range(num_random_graphs), desc="Creating Random Graphs", leave=False
-        ):
-            random_g = PMotifGraphWithRandomization.create_random_graph(graph.copy())
-
-            graph_io.write_shifted_edgelist(
-                random_g,
-                edge_swapped_dir / f"{i}_random.edgelist",
-                shift=required_shift,
-            )
+        graph = pmotif_graph.load_graph()
+        graph_seeds = [
+            int(graph_seed.generate_state(1)[0])
+            for graph_seed in np.random.SeedSequence(seed).spawn(num_random_graphs)
+        ]
+        initargs = (graph, edge_swapped_dir, required_shift, engine)
+        tasks = list(enumerate(graph_seeds))
+        with tqdm(
+            total=num_random_graphs, desc="Creating Random Graphs", leave=False
+        ) as pbar:
+            if workers <= 1:
+                _initialize_randomization_worker(*initargs)
+                for task in tasks:
+                    _create_random_graph_file(task)
+                    pbar.update()
+                _RANDOMIZATION_WORKER_STATE.clear()
+            else:
+                with Pool(
+                    processes=workers,
+                    initializer=_initialize_randomization_worker,
+                    initargs=initargs,
+                ) as pool:
+                    for _ in pool.imap_unordered(_create_random_graph_file, tasks):
+                        pbar.update()
 
         return PMotifGraphWithRandomization(
             pmotif_graph.edgelist_path,
             pmotif_graph.output_directory,
         )
+
+
+# Graph and output location of the running `create_from_pmotif_graph` call.
+# Set once per worker process by `_initialize_randomization_worker`.
+_RANDOMIZATION_WORKER_STATE: Dict[str, Any] = {}
+
+
+def _initialize_randomization_worker(
+    graph: nx.Graph, edge_swapped_dir: Path, shift: int, engine: str
+):
+    """Store the graph to randomize in the current process."""
+    _RANDOMIZATION_WORKER_STATE["graph"] = graph
+    _RANDOMIZATION_WORKER_STATE["edge_swapped_dir"] = edge_swapped_dir
+    _RANDOMIZATION_WORKER_STATE["shift"] = shift
+    _RANDOMIZATION_WORKER_STATE["engine"] = engine
+
+
+def _create_random_graph_file(task: Tuple[int, int]):
+    """Create the random graph with the given index and seed, and write its edgelist."""
+    index, graph_seed = task
+    random_g = PMotifGraphWithRandomization.create_random_graph(
+        _RANDOMIZATION_WORKER_STATE["graph"],
+        _RANDOMIZATION_WORKER_STATE["engine"],
+        graph_seed,
+    )
+    graph_io.write_shifted_edgelist(
+        random_g,
+        _RANDOMIZATION_WORKER_STATE["edge_swapped_dir"] / f"{index}_random.edgelist",
+        shift=_RANDOMIZATION_WORKER_STATE["shift"],
+    )
@@ -1,11 +1,26 @@
 """Null models to randomize input graph."""
+from __future__ import annotations
 import random
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
 import networkx as nx
+import numpy as np
+
+from pmotif_lib.csr_graph import CSRGraph
+
+# Edge swapping engines
+NETWORKX_ENGINE = "networkx"
+ARRAY_ENGINE = "array"
 
 
-def swap_edges_markov_chain(graph: nx.Graph, num: int, tries: int):
+def swap_edges_markov_chain(
+    graph: nx.Graph, num: int, tries: int, seed: Optional[int] = None
+):
     """Classic markov style edge swapping algorithm.
-    Reimplementation of the edgeswapping algo employed by gtrieScanner."""
+    Reimplementation of the edgeswapping algo employed by gtrieScanner.
+    Draws from the global `random` state, or from its own state seeded with `seed`."""
+    rng = random if seed is None else random.Random(seed)
     node_ids = list(graph.nodes)
 
     for _ in range(num):
@@ -13,7 +28,7 @@ def swap_edges_markov_chain(graph: nx.Graph, num: int, tries: int):
             src_neighbors = list(graph.neighbors(src))
             for dst in src_neighbors:
                 for _ in range(tries):
-                    new_src = random.choice(node_ids)
+                    new_src = rng.choice(node_ids)
                     new_src_neighbors = list(graph.neighbors(new_src))
 
                     if len(new_src_neighbors) == 0:
@@ -21,7 +36,7 @@ def swap_edges_markov_chain(graph: nx.Graph, num: int, tries: int):
                     if not _is_valid_new_src(dst, graph, new_src, src):
                         continue
 
-                    new_dst = random.choice(new_src_neighbors)
+                    new_dst = rng.choice(new_src_neighbors)
                     if not _is_valid_new_dst(dst, graph, new_dst, src):
                         continue
 
@@ -51,3 +66,348 @@ def _is_valid_new_src(dst, graph, new_src, src):
     """Checks whether a new source for an edge is not the same as the old source or old destination
     and whether new_src-dst is not already an edge in graph."""
     return src != new_src and dst != new_src and not graph.has_edge(new_src, dst)
+
+
+def swap_edges_array(
+    graph: nx.Graph, num: int, tries: int, seed: Optional[int] = None
+) -> nx.Graph:
+    """The markov style edge swapping of `swap_edges_markov_chain` on NumPy arrays.
+    Evaluates the swaps of whole windows of the sweep at once, with batched random numbers,
+    and only evaluates those swaps again which depend on an earlier swap of the same window.
+    This yields the same markov chain as the sequential algorithm.
+    Reproducible through `seed`. Returns a new graph with the nodes of `graph`."""
+    nodes = list(graph.nodes)
+    node_index = {node: i for i, node in enumerate(nodes)}
+    edges = np.array(
+        [node_index[node] for edge in graph.edges() for node in edge], dtype=np.int64
+    ).reshape(-1, 2)
+    swapper = _ArrayEdgeSwapper(
+        CSRGraph.from_edges(edges[:, 0], edges[:, 1], np.arange(len(nodes)))
+    )
+
+    rng = np.random.default_rng(seed)
+    for _ in range(num):
+        swapper.sweep(rng, tries)
+
+    random_graph = nx.Graph()
+    random_graph.add_nodes_from(nodes)
+    node_labels = np.array(nodes, dtype=object)
+    sources, targets = swapper.edges()
+    random_graph.add_edges_from(
+        zip(node_labels[sources].tolist(), node_labels[targets].tolist())
+    )
+    # Self loops are never swapped
+    random_graph.add_edges_from(nx.selfloop_edges(graph))
+    return random_graph
+
+
+class _ArrayEdgeSwapper:
+    """Edge swapping state of `swap_edges_array`. Every node keeps a fixed region of slots in
+    the CSR neighbor array, as swaps preserve degrees. A sweep visits all slots in order, each
+    slot holding the edge src-dst swapped at that position.
+
+    Slots and edges read or written by a swap are tracked as values: a slot as `-1 - slot`,
+    an edge u-v as `min(u, v) * node_count + max(u, v)`."""
+
+    # Least number of sweep positions evaluated at once
+    _MIN_WINDOW_SIZE = 2**8
+
+    def __init__(self, graph: CSRGraph):
+        self.node_count = graph.id_count
+        self.indptr = graph.indptr
+        self.indices = graph.indices.astype(np.int64)
+        self.degrees = graph.degrees()
+        self.slot_owners = np.repeat(np.arange(self.node_count), self.degrees)
+
+        # The slot holding the same edge in the region of the other node: The n-th slot in
+        # (owner, neighbor) order mirrors the n-th slot in (neighbor, owner) order
+        self.mirrors = np.empty(len(self.indices), dtype=np.int64)
+        self.mirrors[np.lexsort((self.indices, self.slot_owners))] = np.lexsort(
+            (self.slot_owners, self.indices)
+        )
+
+    def edges(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the node ids of the sources and of the targets of the current edges."""
+        is_first = self.slot_owners < self.indices
+        return self.slot_owners[is_first], self.indices[is_first]
+
+    def _edge_keys(self, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+        return np.minimum(u, v) * self.node_count + np.maximum(u, v)
+
+    def _has_edge(self, u: int, v: int) -> bool:
+        """Return whether u-v is an edge."""
+        if self.degrees[u] > self.degrees[v]:
+            u, v = v, u
+        return bool(np.any(self.indices[self.indptr[u] : self.indptr[u + 1]] == v))
+
+    def _has_edges(self, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+        """Return whether each u-v is an edge, by scanning the slots of the endpoint with the
+        lower degree."""
+        is_u_lower = self.degrees[u] <= self.degrees[v]
+        scanned = np.where(is_u_lower, u, v)
+        searched = np.where(is_u_lower, v, u)
+        lengths = self.degrees[scanned]
+        # Positions of all slots of the scanned nodes in `indices`
+        offsets = np.cumsum(lengths) - lengths
+        slots = np.repeat(self.indptr[scanned] - offsets, lengths) + np.arange(
+            lengths.sum()
+        )
+        queries = np.repeat(np.arange(len(u)), lengths)
+        is_hit = self.indices[slots] == searched[queries]
+        return np.bincount(queries[is_hit], minlength=len(u)) > 0
+
+    def sweep(self, rng: np.random.Generator, tries: int):
+        """Try to swap the edge at every slot once, `tries` times at most."""
+        slot_count = len(self.indices)
+        # Larger windows save per-window overhead, but make more positions stale
+        window_size = max(self._MIN_WINDOW_SIZE, 2 ** round(np.log2(slot_count + 1) / 2))
+        for start in range(0, slot_count, window_size):
+            src_slots = np.arange(start, min(start + window_size, slot_count))
+            # Per position and try, a random new_src and a random fraction of its neighbors
+            draws = rng.random((len(src_slots), tries, 2))
+            self._sweep_window(
+                src_slots,
+                (draws[:, :, 0] * self.node_count).astype(np.int64),
+                draws[:, :, 1],
+            )
+
+    def _sweep_window(
+        self, src_slots: np.ndarray, new_srcs: np.ndarray, fractions: np.ndarray
+    ):
+        """Evaluate the swaps of all positions of the window on the current state, and apply
+        them in runs. A position reading a value written by an earlier swap of the window is
+        evaluated again, once all positions before it are applied."""
+        window_size = len(src_slots)
+        tries = self._try_swaps(src_slots, new_srcs, fractions)
+        is_swapped = tries.new_src_slots >= 0
+        written = self._written_values(
+            src_slots[is_swapped], tries.new_src_slots[is_swapped]
+        )
+        is_stale = _reads_earlier_write(
+            written.ravel(),
+            np.repeat(np.flatnonzero(is_swapped), written.shape[1]),
+            tries.reads,
+            tries.reader_positions,
+            window_size,
+        )
+        read_order = np.argsort(tries.reads, kind="stable")
+        sorted_reads = tries.reads[read_order]
+        sorted_reader_positions = tries.reader_positions[read_order]
+
+        position = 0
+        while position < window_size:
+            stale_positions = np.flatnonzero(is_stale[position:])
+            run_end = (
+                position + stale_positions[0]
+                if len(stale_positions) > 0
+                else window_size
+            )
+            is_run_swap = is_swapped[position:run_end]
+            self._swap(
+                src_slots[position:run_end][is_run_swap],
+                tries.new_src_slots[position:run_end][is_run_swap],
+            )
+            if run_end == window_size:
+                break
+
+            new_src_slot = self._retry_swap(
+                int(src_slots[run_end]), new_srcs[run_end], fractions[run_end]
+            )
+            if new_src_slot >= 0:
+                # Later positions reading a value written by the retried swap are stale
+                values = self._swap(
+                    src_slots[run_end : run_end + 1], np.array([new_src_slot])
+                )
+                firsts = np.searchsorted(sorted_reads, values, "left")
+                lasts = np.searchsorted(sorted_reads, values, "right")
+                for first, last in zip(firsts.tolist(), lasts.tolist()):
+                    readers = sorted_reader_positions[first:last]
+                    is_stale[readers[readers > run_end]] = True
+            position = run_end + 1
+
+    def _retry_swap(
+        self, src_slot: int, new_srcs: np.ndarray, fractions: np.ndarray
+    ) -> int:
+        """Evaluate the swap tries of a single position on the current state, as in
+        swap_edges_markov_chain. Return the slot of the chosen new_src-new_dst edge, or -1."""
+        src, dst = int(self.slot_owners[src_slot]), int(self.indices[src_slot])
+        for new_src, fraction in zip(new_srcs.tolist(), fractions.tolist()):
+            new_src_degree = int(self.degrees[new_src])
+            if new_src_degree == 0 or new_src in (src, dst):
+                continue
+            if self._has_edge(new_src, dst):
+                continue
+            new_src_slot = int(self.indptr[new_src]) + int(fraction * new_src_degree)
+            new_dst = int(self.indices[new_src_slot])
+            if new_dst in (src, dst) or self._has_edge(src, new_dst):
+                continue
+            return new_src_slot
+        return -1
+
+    def _written_values(
+        self, src_slots: np.ndarray, new_src_slots: np.ndarray
+    ) -> np.ndarray:
+        """Return the (n_swaps x 8) slots and edges written by swapping the edges at
+        `src_slots` and `new_src_slots`."""
+        srcs, dsts = self.slot_owners[src_slots], self.indices[src_slots]
+        new_srcs = self.slot_owners[new_src_slots]
+        new_dsts = self.indices[new_src_slots]
+        return np.stack(
+            [
+                -1 - src_slots,
+                -1 - self.mirrors[src_slots],
+                -1 - new_src_slots,
+                -1 - self.mirrors[new_src_slots],
+                self._edge_keys(srcs, dsts),
+                self._edge_keys(new_srcs, new_dsts),
+                self._edge_keys(srcs, new_dsts),
+                self._edge_keys(new_srcs, dsts),
+            ],
+            axis=1,
+        )
+
+    def _swap(self, src_slots: np.ndarray, new_src_slots: np.ndarray) -> np.ndarray:
+        """Swap the edges src-dst at `src_slots` with the edges new_src-new_dst at
+        `new_src_slots` to src-new_dst and new_src-dst. The swaps must not share a slot or an
+        edge. Return the written values."""
+        written = self._written_values(src_slots, new_src_slots)
+        srcs, dsts = self.slot_owners[src_slots], self.indices[src_slots]
+        new_srcs = self.slot_owners[new_src_slots]
+        new_dsts = self.indices[new_src_slots]
+        dst_slots = self.mirrors[src_slots]
+        new_dst_slots = self.mirrors[new_src_slots]
+
+        self.indices[src_slots] = new_dsts
+        self.indices[new_dst_slots] = srcs
+        self.indices[new_src_slots] = dsts
+        self.indices[dst_slots] = new_srcs
+        self.mirrors[src_slots] = new_dst_slots
+        self.mirrors[new_dst_slots] = src_slots
+        self.mirrors[new_src_slots] = dst_slots
+        self.mirrors[dst_slots] = new_src_slots
+        return written.ravel()
+
+    def _try_swaps(
+        self, src_slots: np.ndarray, new_srcs: np.ndarray, fractions: np.ndarray
+    ) -> _SwapTries:
+        """Evaluate the (n_positions x n_tries) swap tries for the edges at `src_slots`
+        on the current state. Most swaps succeed at their first try, so all other tries are
+        only evaluated for the rest."""
+        positions = np.arange(len(src_slots))
+        first_try = self._try_swaps_at(
+            positions, src_slots, new_srcs[:, :1], fractions[:, :1]
+        )
+        pending = np.flatnonzero(first_try.new_src_slots < 0)
+        other_tries = self._try_swaps_at(
+            pending, src_slots[pending], new_srcs[pending, 1:], fractions[pending, 1:]
+        )
+        new_src_slots = first_try.new_src_slots
+        new_src_slots[pending] = other_tries.new_src_slots
+        return _SwapTries(
+            new_src_slots=new_src_slots,
+            reads=np.concatenate([-1 - src_slots, first_try.reads, other_tries.reads]),
+            reader_positions=np.concatenate(
+                [positions, first_try.reader_positions, other_tries.reader_positions]
+            ),
+        )
+
+    def _try_swaps_at(
+        self,
+        positions: np.ndarray,
+        src_slots: np.ndarray,
+        new_srcs: np.ndarray,
+        fractions: np.ndarray,
+    ) -> _SwapTries:
+        """Evaluate swap tries with the validity checks of swap_edges_markov_chain,
+        stopping at the first valid try of each position."""
+        if new_srcs.size == 0:
+            return _SwapTries(
+                new_src_slots=np.full(len(positions), -1, dtype=np.int64),
+                reads=np.empty(0, dtype=np.int64),
+                reader_positions=np.empty(0, dtype=np.int64),
+            )
+        srcs = self.slot_owners[src_slots][:, None]
+        dsts = self.indices[src_slots][:, None]
+        new_src_degrees = self.degrees[new_srcs]
+        has_neighbors = new_src_degrees > 0
+        new_src_slots = np.where(
+            has_neighbors,
+            self.indptr[new_srcs] + (fractions * new_src_degrees).astype(np.int64),
+            0,
+        )
+        new_dsts = np.where(has_neighbors, self.indices[new_src_slots], -1)
+
+        srcs, dsts = np.broadcast_arrays(srcs, dsts, new_srcs)[:2]
+        checks_new_src = has_neighbors & (new_srcs != srcs) & (new_srcs != dsts)
+        is_valid = checks_new_src.copy()
+        is_valid[checks_new_src] = ~self._has_edges(
+            new_srcs[checks_new_src], dsts[checks_new_src]
+        )
+        checks_new_dst = is_valid & (new_dsts != srcs) & (new_dsts != dsts)
+        is_valid = checks_new_dst.copy()
+        is_valid[checks_new_dst] = ~self._has_edges(
+            srcs[checks_new_dst], new_dsts[checks_new_dst]
+        )
+
+        is_swapped = np.any(is_valid, axis=1)
+        chosen_tries = np.argmax(is_valid, axis=1)
+        is_tried = np.arange(new_srcs.shape[1])[None, :] <= np.where(
+            is_swapped, chosen_tries, new_srcs.shape[1]
+        )[:, None]
+        try_positions = np.broadcast_to(positions[:, None], new_srcs.shape)
+        return _SwapTries(
+            new_src_slots=np.where(
+                is_swapped, new_src_slots[np.arange(len(positions)), chosen_tries], -1
+            ),
+            reads=np.concatenate(
+                [
+                    -1 - new_src_slots[is_tried & has_neighbors],
+                    self._edge_keys(
+                        new_srcs[is_tried & checks_new_src],
+                        dsts[is_tried & checks_new_src],
+                    ),
+                    self._edge_keys(
+                        srcs[is_tried & checks_new_dst],
+                        new_dsts[is_tried & checks_new_dst],
+                    ),
+                ]
+            ),
+            reader_positions=np.concatenate(
+                [
+                    try_positions[is_tried & has_neighbors],
+                    try_positions[is_tried & checks_new_src],
+                    try_positions[is_tried & checks_new_dst],
+                ]
+            ),
+        )
+
+
+@dataclass
+class _SwapTries:
+    """Outcome of swap tries: The slot of the new_src-new_dst edge chosen per position
+    (-1 if no try was valid), and the values read by the tries with the position of each."""
+
+    new_src_slots: np.ndarray
+    reads: np.ndarray
+    reader_positions: np.ndarray
+
+
+def _reads_earlier_write(
+    written: np.ndarray,
+    writer_positions: np.ndarray,
+    reads: np.ndarray,
+    reader_positions: np.ndarray,
+    position_count: int,
+) -> np.ndarray:
+    """Return for each position, whether it reads a value written at an earlier position.
+    Writes have to be ordered by position."""
+    is_stale = np.zeros(position_count, dtype=bool)
+    values, first_writes = np.unique(written, return_index=True)
+    if len(values) == 0:
+        return is_stale
+    value_positions = np.minimum(np.searchsorted(values, reads), len(values) - 1)
+    is_conflict = (values[value_positions] == reads) & (
+        writer_positions[first_writes][value_positions] < reader_positions
+    )
+    is_stale[reader_positions[is_conflict]] = True
+    return is_stale
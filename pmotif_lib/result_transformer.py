@@ -2,23 +2,59 @@
 metrics with consolidation methods into evaluation metrics."""
 from __future__ import annotations
 import os
+from dataclasses import dataclass
 from multiprocessing import Pool
 from pathlib import Path
-from typing import List, Callable
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
+from pmotif_lib.graphlet_occurence import GraphletOccurrenceStore
 from pmotif_lib.p_motif_graph import PMotifGraph, PMotifGraphWithRandomization
 from pmotif_lib.p_metric.p_metric import RawMetric, PreComputation
-from pmotif_lib.p_metric.p_metric_result import PMetricResult
+from pmotif_lib.p_metric.p_metric_result import CHECKPOINT_DIRECTORY, PMetricResult
 
 
 ConsolidationMethod = Callable[[RawMetric, PreComputation], float]
+# Consolidates a whole metric column at once, given as array with one row per occurrence
+VectorizedConsolidationMethod = Callable[[np.ndarray, PreComputation], np.ndarray]
+# Consolidations to apply, by metric name, as in `metric_consolidation.metrics`
+Consolidations = Dict[str, List[Tuple[str, ConsolidationMethod]]]
+
+
+def vectorized_consolidation(
+    vectorized_method: VectorizedConsolidationMethod,
+) -> Callable[[ConsolidationMethod], ConsolidationMethod]:
+    """Decorate a consolidation method with an equivalent vectorized method, which
+    `ResultTransformer.consolidate_metric` calls instead on metric columns of a fixed shape."""
+
+    def decorate(consolidate_method: ConsolidationMethod) -> ConsolidationMethod:
+        consolidate_method.vectorized = vectorized_method
+        return consolidate_method
+
+    return decorate
+
+
+@dataclass
+class ResultSummary:
+    """Compact summary of the consolidated metrics of one graph, grouped by graphlet class.
+    `metric_values` holds the values of each consolidated metric per graphlet class,
+    `metric_histograms` the histogram counts instead, for consolidated metrics with bins."""
+
+    edgelist_path: Path
+    graphlet_size: int
+    graphlet_class_counts: Dict[str, int]
+    metric_values: Dict[str, Dict[str, np.ndarray]]
+    metric_histograms: Dict[str, Dict[str, np.ndarray]]
 
 
 class ResultTransformer:
     """Load raw graphlets and their positional metrics from disk and offers an interface to
-    consolidate the positional metrics into new evaluation metrics."""
+    consolidate the positional metrics into new evaluation metrics.
+    Results loaded from disk are loaded lazily: The columns of `positional_metric_df`
+    (`graphlet_class`, `nodes` and one per metric) are built from the stored arrays on first
+    access, either of the column (`get_column`) or of the whole data frame."""
 
     def __init__(
         self,
@@ -28,14 +64,57 @@ class ResultTransformer:
         graphlet_size: int,
     ):
         self.pmotif_graph: PMotifGraph = pmotif_graph
-        self.positional_metric_df: pd.DataFrame = positional_metric_df
-        self.p_metric_results: List[PMetricResult] = p_metric_results
         self.graphlet_size: int = graphlet_size
 
-        self._p_metric_result_lookup = {r.metric_name: r for r in self.p_metric_results}
+        self._positional_metric_df: pd.DataFrame = positional_metric_df
+        self._p_metric_result_lookup = {r.metric_name: r for r in p_metric_results}
+
+        # State of lazily loaded results, see `_load_result`
+        self._graphlet_occurrences: Optional[GraphletOccurrenceStore] = None
+        self._rows: Optional[np.ndarray] = None
+        self._metric_outputs: Dict[str, Path] = {}
+        self._metric_arrays: Dict[str, np.ndarray] = {}
+        self._pre_computes: Dict[str, PreComputation] = {}
+        self._pending_columns: List[str] = []
+        self._column_order: List[str] = list(positional_metric_df.columns)
+        self._supress_tqdm = False
 
         self._consolidated_metrics: List[str] = []
 
+    @property
+    def positional_metric_df(self) -> pd.DataFrame:
+        """Return a data frame with one row per graphlet occurrence, and a column for its class,
+        its nodes, each positional metric and each consolidated metric.
+        Builds all columns which were not accessed yet."""
+        for column in list(self._pending_columns):
+            self.get_column(column)
+        # Columns added or removed through the returned data frame are kept as they are
+        columns = list(self._positional_metric_df.columns)
+        self._column_order = [c for c in self._column_order if c in columns] + [
+            c for c in columns if c not in self._column_order
+        ]
+        if columns != self._column_order:
+            self._positional_metric_df = self._positional_metric_df[self._column_order]
+        return self._positional_metric_df
+
+    @positional_metric_df.setter
+    def positional_metric_df(self, positional_metric_df: pd.DataFrame):
+        self._positional_metric_df = positional_metric_df
+        self._pending_columns = []
+        self._column_order = list(positional_metric_df.columns)
+
+    @property
+    def p_metric_results(self) -> List[PMetricResult]:
+        """Return the results of all loaded metrics, restricted to the selected rows."""
+        return [self.get_p_metric_result(name) for name in self.metric_names]
+
+    @property
+    def metric_names(self) -> List[str]:
+        """Return the names of all loaded metrics."""
+        return list(self._p_metric_result_lookup) + [
+            name for name in self._metric_outputs if name not in self._p_metric_result_lookup
+        ]
+
     @property
     def consolidated_metrics(self) -> List[str]:
         """Return all consolidated metrics which were applied through `consolidate_metric`."""
@@ -43,9 +122,61 @@ class ResultTransformer:
 
     def get_p_metric_result(self, name: str) -> PMetricResult:
         """Return the result stored under the metric name `name`.
-        Raises a KeyError if no such metric was found on disk."""
+        Its graphlet metrics are those of the selected rows, in the order of
+        `positional_metric_df`. Raises a KeyError if no such metric was found on disk."""
+        if name not in self._p_metric_result_lookup:
+            p_metric_result = PMetricResult.load_from_disk(
+                self._metric_outputs[name], self._supress_tqdm
+            )
+            p_metric_result.graphlet_metrics = self._select_graphlet_metrics(
+                p_metric_result.graphlet_metrics
+            )
+            self._p_metric_result_lookup[name] = p_metric_result
         return self._p_metric_result_lookup[name]
 
+    def get_pre_compute(self, name: str) -> PreComputation:
+        """Return the pre-compute of the metric `name`, without loading its graphlet metrics.
+        Raises a KeyError if no such metric was found on disk."""
+        if name in self._p_metric_result_lookup:
+            return self._p_metric_result_lookup[name].pre_compute
+        if name not in self._pre_computes:
+            self._pre_computes[name] = PMetricResult.load_pre_compute(
+                self._metric_outputs[name]
+            )
+        return self._pre_computes[name]
+
+    def get_column(self, name: str) -> pd.Series:
+        """Return a column of `positional_metric_df`, building only this column if it was
+        not accessed yet."""
+        if name in self._pending_columns:
+            self._set_column(name, self._build_column(name))
+        return self._positional_metric_df[name]
+
+    def get_metric_array(self, name: str) -> Optional[np.ndarray]:
+        """Return the graphlet metrics of the metric `name` as numeric array, with one row per
+        graphlet occurrence. Reads metrics stored as one array (see `PMetricResult`) without
+        building their column. Returns None for metrics which do not fit a numeric array."""
+        if name in self._metric_arrays:
+            return self._metric_arrays[name]
+        if name in self._pending_columns and name not in self._p_metric_result_lookup:
+            graphlet_metrics = PMetricResult.load_graphlet_metrics(
+                self._metric_outputs[name], self._supress_tqdm
+            )
+            if isinstance(graphlet_metrics, np.ndarray):
+                self._metric_arrays[name] = _widen_integers(self._select(graphlet_metrics))
+                return self._metric_arrays[name]
+            self._set_column(name, self._select_graphlet_metrics(graphlet_metrics))
+
+        try:
+            metric_array = np.array(self.get_column(name).tolist())
+        except ValueError:
+            # Inhomogeneous shapes, i.e. lists of varying length
+            return None
+        if metric_array.dtype.kind not in "biuf":
+            return None
+        self._metric_arrays[name] = metric_array
+        return metric_array
+
     def consolidate_metric(
         self,
         metric_name: str,
@@ -55,59 +186,186 @@ class ResultTransformer:
         """Apply `consolidate_method` on the `metric_name` column,
         creating a new `consolidate_name` column.
         Feeds the pre-computation result and the raw metric into the `consolidate_method`.
+        Consolidates the whole column at once instead, if the method has a vectorized
+        counterpart (see `vectorized_consolidation`) and the metric fits a numeric array.
 
         Expects `metric_name` to be a name of a metric in `self.p_metric_results`.
         """
-        p_metric_result = self.get_p_metric_result(metric_name)
+        pre_compute = self.get_pre_compute(metric_name)
 
-        self.positional_metric_df[consolidate_name] = self.positional_metric_df[
-            metric_name
-        ].apply(lambda x: consolidate_method(x, p_metric_result.pre_compute))
+        vectorized_method = getattr(consolidate_method, "vectorized", None)
+        metric_array = None
+        if vectorized_method is not None:
+            metric_array = self.get_metric_array(metric_name)
+        if metric_array is not None:
+            self._positional_metric_df[consolidate_name] = vectorized_method(
+                metric_array, pre_compute
+            )
+        else:
+            self._positional_metric_df[consolidate_name] = self.get_column(
+                metric_name
+            ).apply(lambda x: consolidate_method(x, pre_compute))
+        if consolidate_name not in self._column_order:
+            self._column_order.append(consolidate_name)
         self._consolidated_metrics.append(consolidate_name)
 
+    def summarize(
+        self,
+        consolidations: Consolidations,
+        histogram_bins: Optional[Dict[str, Sequence[float]]] = None,
+    ) -> ResultSummary:
+        """Apply the consolidations and group the consolidated metrics by graphlet class.
+        Consolidated metrics with an entry in `histogram_bins` are summarized as histogram
+        counts over these bin edges, others as arrays of their values."""
+        histogram_bins = histogram_bins or {}
+        for metric_name, metric_consolidations in consolidations.items():
+            for consolidate_name, consolidate_method in metric_consolidations:
+                self.consolidate_metric(metric_name, consolidate_name, consolidate_method)
+
+        graphlet_class_column = self.get_column("graphlet_class").to_numpy()
+        class_rows = {
+            graphlet_class: np.flatnonzero(graphlet_class_column == graphlet_class)
+            for graphlet_class in pd.unique(graphlet_class_column)
+        }
+        metric_values: Dict[str, Dict[str, np.ndarray]] = {c: {} for c in class_rows}
+        metric_histograms: Dict[str, Dict[str, np.ndarray]] = {c: {} for c in class_rows}
+        for metric_consolidations in consolidations.values():
+            for consolidate_name, _ in metric_consolidations:
+                values = self.get_column(consolidate_name).to_numpy(dtype=np.float64)
+                for graphlet_class, rows in class_rows.items():
+                    if consolidate_name in histogram_bins:
+                        metric_histograms[graphlet_class][consolidate_name] = np.histogram(
+                            values[rows], bins=histogram_bins[consolidate_name]
+                        )[0]
+                    else:
+                        metric_values[graphlet_class][consolidate_name] = values[rows]
+
+        return ResultSummary(
+            edgelist_path=self.pmotif_graph.edgelist_path,
+            graphlet_size=self.graphlet_size,
+            graphlet_class_counts={c: len(rows) for c, rows in class_rows.items()},
+            metric_values=metric_values,
+            metric_histograms=metric_histograms,
+        )
+
+    def _build_column(self, name: str) -> Union[np.ndarray, List]:
+        """Build a lazily loaded column from the stored occurrences or graphlet metrics,
+        keeping the selected rows."""
+        if name == "graphlet_class":
+            graphlet_classes = np.array(
+                self._graphlet_occurrences.graphlet_classes, dtype=object
+            )
+            class_ids = self._select(self._graphlet_occurrences.graphlet_class_ids)
+            return graphlet_classes[class_ids]
+        if name == "nodes":
+            return [
+                [str(n) for n in nodes]
+                for nodes in self._select(self._graphlet_occurrences.nodes).tolist()
+            ]
+
+        if name in self._p_metric_result_lookup:
+            # Rows are already selected, see `get_p_metric_result`
+            return self._p_metric_result_lookup[name].graphlet_metrics
+        if name in self._metric_arrays:
+            # Rows are already selected
+            return _array_column_values(self._metric_arrays[name])
+        graphlet_metrics = PMetricResult.load_graphlet_metrics(
+            self._metric_outputs[name], self._supress_tqdm
+        )
+        if isinstance(graphlet_metrics, np.ndarray):
+            return _array_column_values(self._select(graphlet_metrics))
+        return self._select_graphlet_metrics(graphlet_metrics)
+
+    def _select_graphlet_metrics(self, graphlet_metrics: List[RawMetric]) -> List[RawMetric]:
+        """Return the graphlet metrics of the selected rows."""
+        if self._rows is None:
+            return graphlet_metrics
+        return [graphlet_metrics[row] for row in self._rows.tolist()]
+
+    def _set_column(self, name: str, values: Union[np.ndarray, List]):
+        """Set a lazily loaded column."""
+        self._positional_metric_df[name] = pd.Series(
+            values, index=self._positional_metric_df.index
+        )
+        self._pending_columns.remove(name)
+
+    def _select(self, column: np.ndarray) -> np.ndarray:
+        """Return the selected rows of a column of all graphlet occurrences."""
+        if self._rows is None:
+            return column
+        return column[self._rows]
+
     @staticmethod
     def load_result(
         edgelist: Path,
         out: Path,
         graphlet_size: int,
         supress_tqdm: bool = False,
+        metric_names: Optional[List[str]] = None,
+        graphlet_classes: Optional[List[str]] = None,
     ) -> ResultTransformer:
-        """Load results by building a pgraph from input args."""
+        """Load results by building a pgraph from input args.
+        Loads only the metrics in `metric_names` and the occurrences of the classes in
+        `graphlet_classes`, if given."""
         pgraph = PMotifGraph(edgelist, out)
-        return ResultTransformer._load_result(pgraph, graphlet_size, supress_tqdm)
+        return ResultTransformer._load_result(
+            pgraph, graphlet_size, supress_tqdm, metric_names, graphlet_classes
+        )
 
     @staticmethod
     def _load_result(
-        pgraph: PMotifGraph, graphlet_size: int, supress_tqdm: bool
+        pgraph: PMotifGraph,
+        graphlet_size: int,
+        supress_tqdm: bool,
+        metric_names: Optional[List[str]] = None,
+        graphlet_classes: Optional[List[str]] = None,
     ) -> ResultTransformer:
-        """Load results for a given pgraph from disk."""
-        g_p = pgraph.load_graphlet_pos_zip(graphlet_size, supress_tqdm)
-
+        """Load results for a given pgraph from disk, building columns lazily.
+        Skips metrics whose calculation was interrupted (see `MetricCheckpoint`).
+        Raises a KeyError if a metric of `metric_names` was not found on disk."""
         pmetric_output_directory = pgraph.get_pmetric_directory(graphlet_size)
 
-        p_metric_results = [
-            PMetricResult.load_from_disk(
-                pmetric_output_directory / content, supress_tqdm
-            )
-            for content in os.listdir(str(pmetric_output_directory))
+        metric_outputs = {
+            content: pmetric_output_directory / content
+            for content in sorted(os.listdir(str(pmetric_output_directory)))
             if (pmetric_output_directory / content).is_dir()
-        ]
-
-        graphlet_data = []
-        for i, g_oc in enumerate(g_p):
-            row = {"graphlet_class": g_oc.graphlet_class, "nodes": g_oc.nodes}
-            for metric_result in p_metric_results:
-                row[metric_result.metric_name] = metric_result.graphlet_metrics[i]
-            graphlet_data.append(row)
+            and not (pmetric_output_directory / content / CHECKPOINT_DIRECTORY).exists()
+        }
+        if metric_names is not None:
+            metric_outputs = {name: metric_outputs[name] for name in metric_names}
 
-        positional_metric_df = pd.DataFrame(graphlet_data)
+        graphlet_occurrences = pgraph.load_graphlet_pos_zip(graphlet_size, supress_tqdm)
+        rows = None
+        if graphlet_classes is not None:
+            selected_classes = set(graphlet_classes)
+            selected_class_ids = [
+                class_id
+                for class_id, graphlet_class in enumerate(
+                    graphlet_occurrences.graphlet_classes
+                )
+                if graphlet_class in selected_classes
+            ]
+            rows = np.flatnonzero(
+                np.isin(graphlet_occurrences.graphlet_class_ids, selected_class_ids)
+            )
 
-        return ResultTransformer(
+        result_transformer = ResultTransformer(
             pmotif_graph=pgraph,
-            positional_metric_df=positional_metric_df,
-            p_metric_results=p_metric_results,
+            positional_metric_df=pd.DataFrame(
+                index=pd.RangeIndex(len(graphlet_occurrences)) if rows is None else rows
+            ),
+            p_metric_results=[],
             graphlet_size=graphlet_size,
         )
+        result_transformer._graphlet_occurrences = graphlet_occurrences
+        result_transformer._rows = rows
+        result_transformer._metric_outputs = metric_outputs
+        result_transformer._pending_columns = ["graphlet_class", "nodes"] + list(
+            metric_outputs
+        )
+        result_transformer._column_order = list(result_transformer._pending_columns)
+        result_transformer._supress_tqdm = supress_tqdm
+        return result_transformer
 
     @staticmethod
     def load_randomized_results(
@@ -115,14 +373,18 @@ class ResultTransformer:
         graphlet_size: int,
         supress_tqdm: bool = False,
         workers: int = 1,
+        metric_names: Optional[List[str]] = None,
+        graphlet_classes: Optional[List[str]] = None,
     ) -> List[ResultTransformer]:
-        """Loads `graphlet_size`-graphlets and computed metrics which are present on disk."""
+        """Loads `graphlet_size`-graphlets and computed metrics which are present on disk.
+        Loads only the metrics in `metric_names` and the occurrences of the classes in
+        `graphlet_classes`, if given."""
         pmotif_with_rand = PMotifGraphWithRandomization(
             pmotif_graph.edgelist_path, pmotif_graph.output_directory
         )
 
         input_args = [
-            (swapped_graph, graphlet_size, supress_tqdm)
+            (swapped_graph, graphlet_size, supress_tqdm, metric_names, graphlet_classes)
             for swapped_graph in pmotif_with_rand.swapped_graphs
         ]
 
@@ -137,3 +399,66 @@ class ResultTransformer:
                 pbar,
                 chunksize=1,
             )
+
+    @staticmethod
+    def summarize_randomized_results(
+        pmotif_graph: PMotifGraph,
+        graphlet_size: int,
+        consolidations: Consolidations,
+        histogram_bins: Optional[Dict[str, Sequence[float]]] = None,
+        graphlet_classes: Optional[List[str]] = None,
+        workers: int = 1,
+    ) -> List[ResultSummary]:
+        """Summarizes the results of each randomized graph (see `summarize`), instead of
+        returning them: Each result is loaded, consolidated and summarized in a worker of a pool
+        of `workers` processes, and only its summary is sent back, as soon as it is done.
+        Loads only the consolidated metrics and the occurrences of the classes in
+        `graphlet_classes`, if given. Returns the summaries in the order of the random graphs."""
+        pmotif_with_rand = PMotifGraphWithRandomization(
+            pmotif_graph.edgelist_path, pmotif_graph.output_directory
+        )
+        tasks = [
+            (i, swapped_graph, graphlet_size, consolidations, histogram_bins, graphlet_classes)
+            for i, swapped_graph in enumerate(pmotif_with_rand.swapped_graphs)
+        ]
+
+        summaries: List[Optional[ResultSummary]] = [None] * len(tasks)
+        with tqdm(total=len(tasks), desc="Summarizing Randomized Results") as pbar:
+            if workers <= 1:
+                for index, summary in map(_summarize_result, tasks):
+                    summaries[index] = summary
+                    pbar.update()
+            else:
+                with Pool(processes=workers) as pool:
+                    for index, summary in pool.imap_unordered(_summarize_result, tasks):
+                        summaries[index] = summary
+                        pbar.update()
+        return summaries
+
+
+def _array_column_values(metric_array: np.ndarray) -> Union[np.ndarray, List[RawMetric]]:
+    """Return the values of a metric column from an array of graphlet metrics:
+    The array itself for one-dimensional metrics, a list of each row otherwise."""
+    if metric_array.ndim > 1:
+        return metric_array.tolist()
+    return _widen_integers(metric_array)
+
+
+def _widen_integers(metric_array: np.ndarray) -> np.ndarray:
+    """Integers are stored in the smallest fitting dtype, widen them for calculations."""
+    if metric_array.dtype.kind in "iu":
+        return metric_array.astype(np.int64)
+    return metric_array
+
+
+def _summarize_result(task: tuple) -> Tuple[int, ResultSummary]:
+    """Load, consolidate and summarize the results of one randomized graph."""
+    index, pgraph, graphlet_size, consolidations, histogram_bins, graphlet_classes = task
+    result_transformer = ResultTransformer._load_result(  # pylint: disable=protected-access
+        pgraph,
+        graphlet_size,
+        supress_tqdm=True,
+        metric_names=list(consolidations),
+        graphlet_classes=graphlet_classes,
+    )
+    return index, result_transformer.summarize(consolidations, histogram_bins)
@@ -3,6 +3,8 @@ grouped by their isomorphic class (returns all graphlet occurrences)"""
 # Code in showcase intentionally duplicated, so examples can stand alone
 # pylint: disable=duplicate-code
 import shutil
+from contextlib import closing
+from itertools import islice
 from pathlib import Path
 
 from pmotif_lib.p_motif_graph import PMotifGraph
@@ -26,8 +28,13 @@ def main(edgelist: Path, output: Path, graphlet_size: int):
         gtrieScanner_executable=GTRIESCANNER_EXECUTABLE,
     )
 
-    graphlet_occurrences = pmotif_graph.load_graphlet_pos_zip(graphlet_size)
-    print(graphlet_occurrences[0].graphlet_class, graphlet_occurrences[0].nodes)
+    # Only one chunk of occurrences is held in memory at a time,
+    # closing the iterator closes the occurrence file
+    with closing(
+        pmotif_graph.iter_graphlet_occurrences(graphlet_size, chunk_size=100)
+    ) as chunks:
+        for graphlet_occurrences in islice(chunks, 1):
+            print(graphlet_occurrences[0].graphlet_class, graphlet_occurrences[0].nodes)
 
 
 if __name__ == "__main__":
@@ -7,7 +7,7 @@ from statistics import mean, stdev
 
 from pmotif_lib.p_motif_graph import PMotifGraph, PMotifGraphWithRandomization
 from pmotif_lib.graphlet_representation import graphlet_class_to_name
-from pmotif_lib.gtrieScanner.wrapper import run_gtrieScanner
+from pmotif_lib.gtrieScanner.wrapper import run_gtrieScanner_batch
 
 
 DATASET = Path("./artifacts") / "karate_club.edgelist"
@@ -16,6 +16,8 @@ GTRIESCANNER_EXECUTABLE = "gtrieScanner"  # is in PATH
 OUTPUT = Path("./artifacts") / "showcase_output"
 NUMBER_OF_RANDOM_GRAPHS = 10
 
+WORKERS = 1
+
 
 def main(
     edgelist: Path, output: Path, graphlet_size: int, number_of_random_graphs: int
@@ -23,12 +25,24 @@ def main(
     """Run a motif detection."""
     pmotif_graph = PMotifGraph(edgelist, output)
 
-    original_frequency = graphlet_detection(pmotif_graph, graphlet_size)
-
     randomized_pmotif_graph = PMotifGraphWithRandomization.create_from_pmotif_graph(
-        pmotif_graph, number_of_random_graphs
+        pmotif_graph, number_of_random_graphs, workers=WORKERS
     )
 
+    # Detect graphlets in the original and all random graphs concurrently
+    for job_result in run_gtrieScanner_batch(
+        [pmotif_graph] + randomized_pmotif_graph.swapped_graphs,
+        [graphlet_size],
+        GTRIESCANNER_EXECUTABLE,
+        workers=WORKERS,
+    ):
+        if job_result.failed:
+            raise RuntimeError(
+                f"Graphlet detection failed for {job_result.graph_edgelist}: "
+                f"{job_result.error}"
+            )
+
+    original_frequency = graphlet_detection(pmotif_graph, graphlet_size)
     random_frequencies = []
     for random_graph in randomized_pmotif_graph.swapped_graphs:
         random_frequency = graphlet_detection(random_graph, graphlet_size)
@@ -54,14 +68,7 @@ def analyse(original_frequency, random_frequencies):
 
 
 def graphlet_detection(pgraph: PMotifGraph, graphlet_size: int):
-    """Perform a graphlet detection and return the graphlet class frequencies."""
-    run_gtrieScanner(
-        graph_edgelist=pgraph.get_graph_path(),
-        graphlet_size=graphlet_size,
-        output_directory=pgraph.get_graphlet_directory(),
-        gtrieScanner_executable=GTRIESCANNER_EXECUTABLE,
-    )
-
+    """Load the detected graphlets and return the graphlet class frequencies."""
     graphlet_occurrences = pgraph.load_graphlet_pos_zip(graphlet_size)
     return graphlet_occurrences_to_class_frequencies(graphlet_occurrences)
 
@@ -10,7 +10,7 @@ from scipy.stats import mannwhitneyu
 
 from pmotif_lib.p_motif_graph import PMotifGraph, PMotifGraphWithRandomization
 from pmotif_lib.graphlet_representation import graphlet_class_to_name
-from pmotif_lib.gtrieScanner.wrapper import run_gtrieScanner
+from pmotif_lib.gtrieScanner.wrapper import run_gtrieScanner_batch
 from pmotif_lib.p_metric.p_degree import PDegree
 from pmotif_lib.p_metric.p_metric import PMetric
 from pmotif_lib.p_metric.metric_processing import calculate_metrics
@@ -32,12 +32,25 @@ def main(
     degree_metric = PDegree()
 
     pmotif_graph = PMotifGraph(edgelist, output)
-    original_metrics_by_graphlet_class = get_metrics_by_graphlet_classes(
-        pmotif_graph, graphlet_size, [degree_metric]
+    randomized_pmotif_graph = PMotifGraphWithRandomization.create_from_pmotif_graph(
+        pmotif_graph, number_of_random_graphs, workers=WORKERS
     )
 
-    randomized_pmotif_graph = PMotifGraphWithRandomization.create_from_pmotif_graph(
-        pmotif_graph, number_of_random_graphs
+    # Detect graphlets in the original and all random graphs concurrently
+    for job_result in run_gtrieScanner_batch(
+        [pmotif_graph] + randomized_pmotif_graph.swapped_graphs,
+        [graphlet_size],
+        GTRIESCANNER_EXECUTABLE,
+        workers=WORKERS,
+    ):
+        if job_result.failed:
+            raise RuntimeError(
+                f"Graphlet detection failed for {job_result.graph_edgelist}: "
+                f"{job_result.error}"
+            )
+
+    original_metrics_by_graphlet_class = get_metrics_by_graphlet_classes(
+        pmotif_graph, graphlet_size, [degree_metric]
     )
     del pmotif_graph
 
@@ -78,15 +91,8 @@ def analyse(original_metrics_by_graphlet_class, random_metrics_by_class):
 def get_metrics_by_graphlet_classes(
     pgraph: PMotifGraph, graphlet_size: int, metrics: List[PMetric]
 ):
-    """Perform a graphlet detection, calculate given metrics on detected graphlets, and
-    return the metrics as a lookup from graphlet class and metric name to the metric values."""
-    run_gtrieScanner(
-        graph_edgelist=pgraph.get_graph_path(),
-        graphlet_size=graphlet_size,
-        output_directory=pgraph.get_graphlet_directory(),
-        gtrieScanner_executable=GTRIESCANNER_EXECUTABLE,
-    )
-
+    """Calculate given metrics on the detected graphlets, and return the metrics
+    as a lookup from graphlet class and metric name to the metric values."""
     graphlet_occurrences = pgraph.load_graphlet_pos_zip(graphlet_size)
     metric_results = calculate_metrics(pgraph, graphlet_size, metrics, True, workers=WORKERS)
 
@@ -0,0 +1,47 @@
+"""Shared fixtures: a small graph with its graphlet occurrences, stored without gtrieScanner."""
+from itertools import combinations
+from pathlib import Path
+from typing import List
+
+import networkx as nx
+import pytest
+
+from pmotif_lib.graphlet_occurence import GraphletOccurrence, GraphletOccurrenceStore
+from pmotif_lib.gtrieScanner.graph_io import write_shifted_edgelist
+from pmotif_lib.p_motif_graph import PMotifGraph
+
+GRAPHLET_SIZE = 3
+
+
+def find_graphlet_occurrences(graph: nx.Graph, graphlet_size: int) -> List[GraphletOccurrence]:
+    """Return all connected induced subgraphs of the given size, classed by the adjacency
+    matrix of their sorted nodes. Isomorphic subgraphs can land in different classes,
+    which is fine for testing the metrics."""
+    graphlet_occurrences = []
+    for nodes in combinations(sorted(graph.nodes, key=int), graphlet_size):
+        subgraph = graph.subgraph(nodes)
+        if not nx.is_connected(subgraph):
+            continue
+        graphlet_class = " ".join(
+            "".join("1" if subgraph.has_edge(u, v) else "0" for v in nodes)
+            for u in nodes
+        )
+        graphlet_occurrences.append(GraphletOccurrence(graphlet_class, list(nodes)))
+    return graphlet_occurrences
+
+
+@pytest.fixture
+def pmotif_graph(tmp_path: Path) -> PMotifGraph:
+    """The karate club graph with node labels starting at 1, and its occurrences of
+    3-graphlets in the binary layout, which `PMotifGraph` reads instead of gtrieScanner output."""
+    edgelist = tmp_path / "karate_club.edgelist"
+    write_shifted_edgelist(nx.karate_club_graph(), edgelist)
+    pmotif_graph = PMotifGraph(edgelist, tmp_path / "output")
+
+    graphlet_occurrences = find_graphlet_occurrences(
+        pmotif_graph.load_graph(), GRAPHLET_SIZE
+    )
+    GraphletOccurrenceStore.from_occurrences(graphlet_occurrences).save_to_disk(
+        pmotif_graph.get_graphlet_pos_binary_directory(GRAPHLET_SIZE)
+    )
+    return pmotif_graph
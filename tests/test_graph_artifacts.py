@@ -0,0 +1,89 @@
+"""Tests of the graph artifact cache: derived artifacts, persistence and staleness."""
+import os
+import time
+
+import pytest
+
+from pmotif_lib.graph_artifacts import (
+    DEGREES,
+    HUB_DISTANCES,
+    HUBS,
+    GraphArtifactCache,
+    get_hubs,
+)
+from pmotif_lib.gtrieScanner.graph_io import (
+    get_csr_sidecar_path,
+    get_stats_sidecar_path,
+    read_edgelist_csr,
+    read_edgelist_stats,
+)
+from pmotif_lib.p_metric.metric_processing import process_graphlet_occurrences
+from pmotif_lib.p_metric.p_anchor_node_distance import PAnchorNodeDistance
+from pmotif_lib.p_metric.p_degree import PDegree
+from pmotif_lib.p_metric.p_graph_module_participation import PGraphModuleParticipation
+
+from conftest import GRAPHLET_SIZE
+
+
+def fail_to_load_graph():
+    raise AssertionError("The graph was loaded!")
+
+
+def test_hubs_match_networkx_hubs(pmotif_graph):
+    artifacts = GraphArtifactCache(
+        graph_loader=fail_to_load_graph, source=pmotif_graph.get_graph_path()
+    )
+    hubs = artifacts.get(HUBS)
+    assert sorted(hubs, key=int) == sorted(get_hubs(pmotif_graph.load_graph()), key=int)
+    assert artifacts.get(HUB_DISTANCES).shape == (len(hubs), 34)
+
+
+def test_rerun_loads_stored_artifacts_without_graph(pmotif_graph):
+    graphlet_occurrences = pmotif_graph.load_graphlet_pos_zip(GRAPHLET_SIZE)
+    metrics = [PDegree(), PAnchorNodeDistance(), PGraphModuleParticipation()]
+    expected = process_graphlet_occurrences(
+        None,
+        graphlet_occurrences,
+        metrics,
+        artifacts=GraphArtifactCache.for_pmotif_graph(pmotif_graph),
+    )
+
+    rerun_artifacts = GraphArtifactCache(
+        graph_loader=fail_to_load_graph,
+        directory=pmotif_graph.get_artifact_directory(),
+        source=pmotif_graph.get_graph_path(),
+    )
+    results = process_graphlet_occurrences(
+        None, graphlet_occurrences, metrics, artifacts=rerun_artifacts
+    )
+    for result, expected_result in zip(results, expected):
+        assert result.graphlet_metrics == expected_result.graphlet_metrics
+
+
+def test_stale_artifacts_are_discarded_and_sidecars_kept(pmotif_graph):
+    edgelist = pmotif_graph.get_graph_path()
+    read_edgelist_csr(edgelist)
+    read_edgelist_stats(edgelist)
+    artifacts = GraphArtifactCache.for_pmotif_graph(pmotif_graph)
+    artifacts.get(DEGREES)
+    artifacts.get("edge_count", lambda cache, _: cache.graph.number_of_edges())
+
+    artifact_directory = pmotif_graph.get_artifact_directory()
+    assert {"degrees.npy", "edge_count.json"} <= set(os.listdir(artifact_directory))
+
+    # A cache of the unchanged edgelist keeps the stored artifacts
+    artifacts = GraphArtifactCache.for_pmotif_graph(pmotif_graph)
+    assert artifacts.get("edge_count", lambda *_: pytest.fail("recomputed")) == 78
+
+    time.sleep(0.01)
+    with open(edgelist, "a", encoding="utf-8") as edgelist_file:
+        edgelist_file.write("1 35 1\n")
+    artifacts = GraphArtifactCache.for_pmotif_graph(pmotif_graph)
+
+    remaining = set(os.listdir(artifact_directory))
+    assert "degrees.npy" not in remaining
+    assert "edge_count.json" not in remaining
+    assert get_csr_sidecar_path(edgelist).name in remaining
+    assert get_stats_sidecar_path(edgelist).name in remaining
+    assert artifacts.get("edge_count", lambda cache, _: cache.graph.number_of_edges()) == 79
+    assert len(artifacts.get(DEGREES)) == 35
@@ -0,0 +1,115 @@
+"""Tests of the metric processing: batch against per-occurrence calculation,
+node labels, and resuming checkpointed calculations."""
+from typing import List
+
+import networkx as nx
+import pytest
+
+from pmotif_lib.graphlet_occurence import GraphletOccurrence
+from pmotif_lib.p_metric.metric_processing import (
+    calculate_metrics,
+    process_graphlet_occurrences,
+)
+from pmotif_lib.p_metric.p_anchor_node_distance import PAnchorNodeDistance
+from pmotif_lib.p_metric.p_degree import PDegree
+from pmotif_lib.p_metric.p_graph_module_participation import PGraphModuleParticipation
+from pmotif_lib.p_metric.p_metric import PMetric, PreComputation
+from pmotif_lib.p_metric.p_metric_result import PMetricResult
+
+from conftest import GRAPHLET_SIZE
+
+
+class SortedNodes(PMetric):
+    """Per-occurrence metric which only needs the graph, and any hashable node labels."""
+
+    def __init__(self):
+        super().__init__("sortedNodes")
+
+    def pre_computation(self, graph: nx.Graph) -> PreComputation:
+        return {"node_count": graph.number_of_nodes()}
+
+    def metric_calculation(
+        self, graph: nx.Graph, graphlet_nodes: List[str], pre_compute: PreComputation
+    ) -> List[str]:
+        return sorted(graphlet_nodes)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_per_occurrence_metrics_accept_string_labels(workers: int):
+    graph = nx.Graph([("a", "b"), ("b", "c"), ("c", "d")])
+    graphlet_occurrences = [
+        GraphletOccurrence("011 100 100", ["b", "a", "c"]),
+        GraphletOccurrence("011 100 100", ["c", "b", "d"]),
+    ]
+    (result,) = process_graphlet_occurrences(
+        graph, graphlet_occurrences, [SortedNodes()], workers=workers
+    )
+    assert result.pre_compute == {"node_count": 4}
+    assert result.graphlet_metrics == [["a", "b", "c"], ["b", "c", "d"]]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batch_calculation_matches_per_occurrence_calculation(pmotif_graph, workers: int):
+    graph = pmotif_graph.load_graph()
+    graphlet_occurrences = pmotif_graph.load_graphlet_pos_zip(GRAPHLET_SIZE)
+    metrics = [PDegree(), PAnchorNodeDistance(), PGraphModuleParticipation()]
+
+    results = process_graphlet_occurrences(
+        graph, graphlet_occurrences, metrics, workers=workers
+    )
+
+    for metric, result in zip(metrics, results):
+        expected = [
+            metric.metric_calculation(graph, g_oc.nodes, result.pre_compute)
+            for g_oc in graphlet_occurrences
+        ]
+        assert result.graphlet_metrics == expected, metric.name
+
+
+def test_degree_matches_networkx(pmotif_graph):
+    graph = pmotif_graph.load_graph()
+    graphlet_occurrences = pmotif_graph.load_graphlet_pos_zip(GRAPHLET_SIZE)
+    (result,) = process_graphlet_occurrences(graph, graphlet_occurrences, [PDegree()])
+    assert result.graphlet_metrics == [
+        nx.cut_size(graph, g_oc.nodes) for g_oc in graphlet_occurrences
+    ]
+
+
+def test_resume_continues_after_last_stored_chunk(pmotif_graph, monkeypatch):
+    metrics = [PDegree(), PAnchorNodeDistance()]
+    expected = calculate_metrics(pmotif_graph, GRAPHLET_SIZE, metrics, save_to_disk=False)
+
+    # Chunks are split into blocks, count the occurrences handed to the batch calculation
+    calculated = []
+    calculate_batch = PDegree.metric_calculation_batch
+
+    def interrupt_after_two_chunks(self, graph, graphlet_occurrences, pre_compute):
+        if sum(calculated) == 200:
+            raise KeyboardInterrupt
+        calculated.append(len(graphlet_occurrences))
+        return calculate_batch(self, graph, graphlet_occurrences, pre_compute)
+
+    def count_occurrences(self, graph, graphlet_occurrences, pre_compute):
+        calculated.append(len(graphlet_occurrences))
+        return calculate_batch(self, graph, graphlet_occurrences, pre_compute)
+
+    monkeypatch.setattr(PDegree, "metric_calculation_batch", interrupt_after_two_chunks)
+    with pytest.raises(KeyboardInterrupt):
+        calculate_metrics(pmotif_graph, GRAPHLET_SIZE, metrics, chunk_size=100)
+    with pytest.raises(FileExistsError):
+        calculate_metrics(pmotif_graph, GRAPHLET_SIZE, metrics, chunk_size=100)
+
+    calculated.clear()
+    monkeypatch.setattr(PDegree, "metric_calculation_batch", count_occurrences)
+    results = calculate_metrics(
+        pmotif_graph, GRAPHLET_SIZE, metrics, chunk_size=100, resume=True
+    )
+
+    occurrence_count = len(pmotif_graph.load_graphlet_pos_zip(GRAPHLET_SIZE))
+    assert sum(calculated) == occurrence_count - 200
+    for result, expected_result in zip(results, expected):
+        assert result.graphlet_metrics == expected_result.graphlet_metrics
+        stored = PMetricResult.load_from_disk(
+            pmotif_graph.get_pmetric_directory(GRAPHLET_SIZE) / result.metric_name
+        )
+        assert stored.graphlet_metrics == expected_result.graphlet_metrics
@@ -0,0 +1,36 @@
+"""Tests of storing and loading metric results in both storage formats."""
+import numpy as np
+import pytest
+
+from pmotif_lib.p_metric.p_metric_result import (
+    BINARY_STORAGE,
+    GRAPHLET_METRICS_ARRAY_FILE,
+    GRAPHLET_METRICS_FILE,
+    GRAPHLET_METRICS_VALUES_FILE,
+    JSON_STORAGE,
+    PMetricResult,
+)
+
+GRAPHLET_METRICS = {
+    "integers": ([3, 0, 70000, 5], GRAPHLET_METRICS_ARRAY_FILE),
+    "floats": ([0.5, 1 / 3, 2.0, 0.0], GRAPHLET_METRICS_ARRAY_FILE),
+    "rows": ([[1, 2, 3], [0, 0, 1], [4, 4, 4], [2, 1, 0]], GRAPHLET_METRICS_ARRAY_FILE),
+    "ragged": ([[0, 1], [], [2], [0, 1, 2]], GRAPHLET_METRICS_VALUES_FILE),
+    "strings": (["a", "b", "c", "d"], GRAPHLET_METRICS_FILE),
+}
+
+
+@pytest.mark.parametrize("storage", [JSON_STORAGE, BINARY_STORAGE])
+@pytest.mark.parametrize("metrics_name", list(GRAPHLET_METRICS))
+def test_result_round_trip(tmp_path, storage: str, metrics_name: str):
+    graphlet_metrics, binary_file = GRAPHLET_METRICS[metrics_name]
+    pre_compute = {"anchor_nodes": ["1", "2"], "degrees": np.array([1, 2, 3])}
+    PMetricResult("metric", pre_compute, graphlet_metrics).save_to_disk(tmp_path, storage)
+
+    if storage == BINARY_STORAGE:
+        assert (tmp_path / "metric" / binary_file).is_file()
+    loaded = PMetricResult.load_from_disk(tmp_path / "metric")
+    assert loaded.metric_name == "metric"
+    assert loaded.graphlet_metrics == graphlet_metrics
+    assert loaded.pre_compute["anchor_nodes"] == ["1", "2"]
+    assert np.array_equal(loaded.pre_compute["degrees"], pre_compute["degrees"])
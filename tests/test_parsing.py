@@ -0,0 +1,91 @@
+"""Tests of the block-wise gtrieScanner occurrence parser against a line-by-line parser."""
+import io
+from typing import List
+
+import numpy as np
+import pytest
+
+from pmotif_lib.graphlet_occurence import GraphletOccurrence, GraphletOccurrenceStore
+from pmotif_lib.gtrieScanner.parsing import (
+    iter_graphlet_occurrence_chunks,
+    label_to_graphlet_class,
+    parse_graphlet_occurrences,
+)
+
+GRAPHLET_SIZE = 3
+LABELS = ["011101110:", "011100100:", "010101010:", "001001110:"]
+
+
+def write_motif_pos(lines: int, seed: int = 0) -> bytes:
+    """Return random occurrence lines as written by gtrieScanner."""
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, len(LABELS), lines)
+    nodes = rng.integers(1, 10**6, (lines, GRAPHLET_SIZE))
+    return "".join(
+        f"{LABELS[label]} {' '.join(map(str, row))}\n"
+        for label, row in zip(labels.tolist(), nodes.tolist())
+    ).encode()
+
+
+def parse_line_by_line(motif_pos: bytes) -> List[GraphletOccurrence]:
+    """Parse occurrence lines one at a time, as `load_graphlet_pos_zip` used to."""
+    graphlet_occurrences = []
+    for line in motif_pos.decode().splitlines():
+        if not line.strip():
+            continue
+        label, *nodes = line.split(" ")
+        graphlet_occurrences.append(
+            GraphletOccurrence(
+                graphlet_class=label_to_graphlet_class(label, GRAPHLET_SIZE),
+                nodes=[n.strip() for n in nodes],
+            )
+        )
+    return graphlet_occurrences
+
+
+@pytest.mark.parametrize("block_size", [7, 100, 2**20])
+def test_parser_matches_line_by_line_parser(block_size: int):
+    motif_pos = write_motif_pos(1000)
+    graphlet_occurrences = parse_graphlet_occurrences(
+        io.BytesIO(motif_pos), GRAPHLET_SIZE, block_size=block_size
+    )
+    assert list(graphlet_occurrences) == parse_line_by_line(motif_pos)
+
+
+def test_parser_reads_last_line_without_newline():
+    motif_pos = write_motif_pos(10)[:-1]
+    graphlet_occurrences = parse_graphlet_occurrences(io.BytesIO(motif_pos), GRAPHLET_SIZE)
+    assert list(graphlet_occurrences) == parse_line_by_line(motif_pos)
+
+
+def test_parser_skips_blocks_of_blank_lines():
+    motif_pos = write_motif_pos(10) + b"\n" * 50 + write_motif_pos(10, seed=1) + b"\n"
+    graphlet_occurrences = parse_graphlet_occurrences(
+        io.BytesIO(motif_pos), GRAPHLET_SIZE, block_size=16
+    )
+    assert list(graphlet_occurrences) == parse_line_by_line(motif_pos)
+
+
+def test_parser_rejects_labels_beyond_node_dtype():
+    with pytest.raises(ValueError):
+        parse_graphlet_occurrences(
+            io.BytesIO(b"011101110: 1 2 3000000000\n"), GRAPHLET_SIZE
+        )
+
+
+def test_chunks_have_fixed_size():
+    motif_pos = write_motif_pos(1000)
+    chunks = list(
+        iter_graphlet_occurrence_chunks(io.BytesIO(motif_pos), GRAPHLET_SIZE, 64)
+    )
+    assert [len(chunk) for chunk in chunks] == [64] * 15 + [40]
+    assert [g_oc for chunk in chunks for g_oc in chunk] == parse_line_by_line(motif_pos)
+
+
+def test_store_round_trip(tmp_path):
+    graphlet_occurrences = parse_line_by_line(write_motif_pos(100))
+    store = GraphletOccurrenceStore.from_occurrences(graphlet_occurrences)
+    store.save_to_disk(tmp_path / "motif_pos_binary")
+    for mmap in (True, False):
+        loaded = GraphletOccurrenceStore.load_from_disk(tmp_path / "motif_pos_binary", mmap)
+        assert list(loaded) == graphlet_occurrences
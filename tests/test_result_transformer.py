@@ -0,0 +1,91 @@
+"""Tests of loading results with ResultTransformer, in full and restricted to classes."""
+import pytest
+
+from pmotif_lib.p_metric.metric_consolidation import metrics as consolidations
+from pmotif_lib.p_metric.metric_processing import calculate_metrics
+from pmotif_lib.p_metric.p_anchor_node_distance import PAnchorNodeDistance
+from pmotif_lib.p_metric.p_degree import PDegree
+from pmotif_lib.p_metric.p_metric_result import BINARY_STORAGE, JSON_STORAGE
+from pmotif_lib.result_transformer import ResultTransformer
+
+from conftest import GRAPHLET_SIZE
+
+
+@pytest.fixture(params=[JSON_STORAGE, BINARY_STORAGE])
+def calculated_pmotif_graph(request, pmotif_graph):
+    calculate_metrics(
+        pmotif_graph,
+        GRAPHLET_SIZE,
+        [PDegree(), PAnchorNodeDistance()],
+        storage=request.param,
+    )
+    return pmotif_graph
+
+
+def load_result(pmotif_graph, **kwargs) -> ResultTransformer:
+    return ResultTransformer.load_result(
+        pmotif_graph.edgelist_path,
+        pmotif_graph.output_directory,
+        GRAPHLET_SIZE,
+        supress_tqdm=True,
+        **kwargs,
+    )
+
+
+def test_columns_match_occurrences_and_results(calculated_pmotif_graph):
+    result_transformer = load_result(calculated_pmotif_graph)
+    graphlet_occurrences = calculated_pmotif_graph.load_graphlet_pos_zip(GRAPHLET_SIZE)
+    positional_metric_df = result_transformer.positional_metric_df
+
+    assert list(positional_metric_df.columns) == [
+        "graphlet_class",
+        "nodes",
+        "pAnchorNodeDistance",
+        "pDegree",
+    ]
+    assert positional_metric_df["nodes"].tolist() == [
+        g_oc.nodes for g_oc in graphlet_occurrences
+    ]
+    for p_metric_result in result_transformer.p_metric_results:
+        assert (
+            positional_metric_df[p_metric_result.metric_name].tolist()
+            == p_metric_result.graphlet_metrics
+        )
+
+
+@pytest.mark.parametrize("build_column_first", [False, True])
+def test_graphlet_classes_select_rows(calculated_pmotif_graph, build_column_first: bool):
+    full = load_result(calculated_pmotif_graph)
+    graphlet_classes = full.get_column("graphlet_class").unique()[:2].tolist()
+    selected = load_result(calculated_pmotif_graph, graphlet_classes=graphlet_classes)
+    if build_column_first:
+        selected.get_column("pDegree")
+
+    rows = full.get_column("graphlet_class").isin(graphlet_classes)
+    expected_df = full.positional_metric_df[rows]
+    positional_metric_df = selected.positional_metric_df
+    assert 0 < len(positional_metric_df) < len(full.positional_metric_df)
+    assert positional_metric_df.index.tolist() == expected_df.index.tolist()
+    for column in expected_df.columns:
+        assert positional_metric_df[column].tolist() == expected_df[column].tolist()
+
+    for metric_name in ("pDegree", "pAnchorNodeDistance"):
+        assert (
+            selected.get_p_metric_result(metric_name).graphlet_metrics
+            == expected_df[metric_name].tolist()
+        )
+
+
+def test_consolidation_of_selected_rows(calculated_pmotif_graph):
+    full = load_result(calculated_pmotif_graph)
+    graphlet_classes = full.get_column("graphlet_class").unique()[:1].tolist()
+    selected = load_result(calculated_pmotif_graph, graphlet_classes=graphlet_classes)
+    for result_transformer in (full, selected):
+        for consolidate_name, consolidate_method in consolidations["pDegree"]:
+            result_transformer.consolidate_metric(
+                "pDegree", consolidate_name, consolidate_method
+            )
+
+    for consolidate_name, _ in consolidations["pDegree"]:
+        expected = full.get_column(consolidate_name)[selected.positional_metric_df.index]
+        assert selected.get_column(consolidate_name).tolist() == expected.tolist()